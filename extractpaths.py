@@ -1,71 +1,345 @@
 #!/usr/bin/python3
-import xml.etree.ElementTree as ET
+from xml.parsers import expat
+from xml.sax.handler import ContentHandler
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import argparse
+import html
+import io
+import mmap
+import re
 import sys
 import os
 
-def find_playlist_paths(xml_filepath):
+# Size of each slice of the mapped file handed to expat
+PARSE_CHUNK_SIZE = 1 << 20
+# Buffered output is written out once it reaches this many bytes
+OUTPUT_FLUSH_SIZE = 1 << 16
+
+# Structure of the elements we extract, defined once and shared by both
+# backends: every Path element that is a direct child of a PlaylistItem.
+PLAYLIST_ITEM_TAG = sys.intern("PlaylistItem")
+PATH_TAG = sys.intern("Path")
+
+# Printed in place of a <Path> tag that has no text
+EMPTY_PATH = "[Empty Path Tag]"
+
+# Matches <Path>text</Path> and <Path/> for the regex scan
+PATH_ELEMENT_RE = re.compile(rb'<Path(?:>([^<]*)</Path>|\s*/>)')
+
+# lxml is optional; when installed, the file is streamed by libxml2, which
+# also does the tag matching, so Python only sees PlaylistItem elements.
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+if etree is not None:
+    PARSE_ERRORS = (expat.ExpatError, etree.XMLSyntaxError)
+else:
+    PARSE_ERRORS = (expat.ExpatError,)
+
+def new_tag_interns():
+    """Return an expat intern table that maps our tag names to the constants."""
+    return {PLAYLIST_ITEM_TAG: PLAYLIST_ITEM_TAG, PATH_TAG: PATH_TAG}
+
+# States of PlaylistPathHandler's tag automaton
+OUTSIDE_ITEM, IN_ITEM, IN_PATH = range(3)
+
+class PlaylistPathHandler(ContentHandler):
+    """SAX handler passing the text of each PlaylistItem/Path to a callback.
+
+    The fixed PlaylistItem/Path structure is matched with a small state
+    machine and a depth counter, so each element costs one state check
+    and no element objects are created. The callbacks match expat's
+    handler signatures and are meant to be bound to a raw expat parser
+    created with new_tag_interns(), whose element names are the tag
+    constants themselves, so tags are compared by identity.
+
+    When given that expat parser, the handler installs its character data
+    callback only while a matching Path is open, so text elsewhere in the
+    document (indentation, metadata, cover art) never reaches Python.
+    """
+
+    def __init__(self, emit, parser=None):
+        super().__init__()
+        self.emit = emit
+        self.parser = parser
+        self.state = OUTSIDE_ITEM
+        self.depth = 0
+        self.item_depth = 0
+        self.text = ""
+
+    def startElement(self, name, attrs):
+        self.depth += 1
+        if self.state == OUTSIDE_ITEM:
+            if name is PLAYLIST_ITEM_TAG:
+                self.state = IN_ITEM
+                self.item_depth = self.depth
+        elif self.state == IN_ITEM:
+            # Only a direct child Path of the open PlaylistItem matches
+            if name is PATH_TAG and self.depth == self.item_depth + 1:
+                self.state = IN_PATH
+                self.text = ""
+                if self.parser is not None:
+                    self.parser.CharacterDataHandler = self.characters
+
+    def characters(self, content):
+        if self.state == IN_PATH:
+            # With buffer_text this normally runs once per Path, and adding
+            # to "" hands back content itself, so no copy is made
+            self.text += content
+
+    def endElement(self, name):
+        depth = self.depth
+        self.depth = depth - 1
+        if self.state == IN_PATH:
+            if depth == self.item_depth + 1:
+                self.state = IN_ITEM
+                if self.parser is not None:
+                    self.parser.CharacterDataHandler = None
+                self.emit(self.text)
+        elif self.state == IN_ITEM and depth == self.item_depth:
+            self.state = OUTSIDE_ITEM
+
+class PathWriter:
+    """Buffer extracted paths as encoded bytes and write them in large chunks.
+
+    Avoids a print() call and, usually, a write syscall for every path.
+    """
+
+    def __init__(self, stream=None, flush_size=OUTPUT_FLUSH_SIZE):
+        self.stream = stream if stream is not None else sys.stdout
+        # Write straight to the binary buffer when the stream has one
+        self.raw = getattr(self.stream, 'buffer', None)
+        self.encoding = getattr(self.stream, 'encoding', None) or 'utf-8'
+        self.errors = getattr(self.stream, 'errors', None) or 'strict'
+        self.flush_size = flush_size
+        self.buffer = bytearray()
+
+    def write_path(self, text):
+        # Strip surrounding whitespace; empty or missing text gets the marker.
+        # str.strip() returns the same object when there is nothing to strip,
+        # so the usual whitespace-free path is not copied.
+        buffer = self.buffer
+        buffer += ((text or "").strip() or EMPTY_PATH).encode(self.encoding, self.errors)
+        buffer += b"\n"
+        if len(buffer) >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        if self.raw is not None:
+            # Anything already printed to the text layer must go out first
+            self.stream.flush()
+            self.raw.write(self.buffer)
+            self.raw.flush()
+        else:
+            self.stream.write(self.buffer.decode(self.encoding, self.errors))
+        self.buffer.clear()
+
+def extract_paths_lxml(xml_filepath, emit):
+    """Pass the text of each PlaylistItem/Path to emit, streaming with lxml.
+
+    Each PlaylistItem is cleared and detached once handled, so memory use
+    stays flat regardless of the playlist size.
+    """
+    # Comments and processing instructions are dropped by libxml2 rather
+    # than turned into nodes
+    items = etree.iterparse(xml_filepath, events=("end",), tag=PLAYLIST_ITEM_TAG,
+                            huge_tree=True, collect_ids=False,
+                            remove_comments=True, remove_pis=True)
+    for _, item in items:
+        # A direct child scan by tag, done in C without evaluating XPath
+        for path_element in item.iterchildren(PATH_TAG):
+            emit(path_element.text)
+        item.clear(keep_tail=True)
+        # Drop the already handled items still referenced by the parent
+        while item.getprevious() is not None:
+            del item.getparent()[0]
+
+def feed_expat(parser, f):
+    """Feed an open binary file to an expat parser in PARSE_CHUNK_SIZE reads."""
+    for chunk in iter(lambda: f.read(PARSE_CHUNK_SIZE), b""):
+        parser.Parse(chunk, False)
+    parser.Parse(b"", True)
+
+def extract_paths_expat(xml_filepath, emit):
+    """Pass the text of each PlaylistItem/Path to emit, feeding expat directly.
+
+    Regular files are memory-mapped and handed to expat in slices, so they
+    are never copied through Python-level reads. Binary file objects are
+    read in chunks.
+    """
+    # Element names come back as the interned tag constants
+    parser = expat.ParserCreate(intern=new_tag_interns())
+    # Deliver each run of character data in one callback
+    parser.buffer_text = True
+    parser.buffer_size = PARSE_CHUNK_SIZE
+    # The handler sets CharacterDataHandler itself, only inside Path elements
+    handler = PlaylistPathHandler(emit, parser)
+    parser.StartElementHandler = handler.startElement
+    parser.EndElementHandler = handler.endElement
+
+    if hasattr(xml_filepath, 'read'):
+        feed_expat(parser, xml_filepath)
+        return
+
+    with open(xml_filepath, 'rb', buffering=PARSE_CHUNK_SIZE) as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # Empty files, pipes and other inputs that cannot be mapped are
+            # read in chunks the size of the file buffer instead
+            feed_expat(parser, f)
+            return
+    with mapped, memoryview(mapped) as view:
+        for start in range(0, len(view), PARSE_CHUNK_SIZE):
+            parser.Parse(view[start:start + PARSE_CHUNK_SIZE], False)
+        parser.Parse(b"", True)
+
+def extract_paths_regex(xml_filepath, emit):
+    """Pass the text of each <Path> element to emit, scanning with a regex.
+
+    No XML parsing is done, so this is only correct for machine-generated
+    playlists where Path elements appear solely inside PlaylistItem and
+    never in comments or CDATA sections, as in Jellyfin's playlist.xml.
+    """
+    if hasattr(xml_filepath, 'read'):
+        data = xml_filepath.read()
+    else:
+        with open(xml_filepath, 'rb') as f:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                data = f.read()
+    try:
+        for match in PATH_ELEMENT_RE.finditer(data):
+            text = (match.group(1) or b"").decode("utf-8")
+            # Resolve &amp; and character references the parsers would expand
+            emit(html.unescape(text) if "&" in text else text)
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
+
+def find_playlist_paths(xml_filepath, out=None, fast_scan=False):
     """
     Parses an XML file and prints the text content of elements matching
     the path: Item/PlaylistItems/PlaylistItem/Path.
 
+    Uses lxml when it is installed; otherwise the file is fed straight to
+    expat with a SAX-style handler so no element tree is built at all.
+
     Args:
-        xml_filepath (str): The path to the XML file.
+        xml_filepath (str or file object): The path to the XML file, or a
+            binary file object to read it from.
+        out (TextIO, optional): Stream to print to. Defaults to sys.stdout.
+        fast_scan (bool): Find Path elements with a regex instead of parsing
+            the XML. Only safe for Jellyfin-generated playlists.
     """
 
 #    print(f"--- Parsing file: {xml_filepath} ---")
-    found_paths = []
+    # Paths are written as they are found, batched into large writes.
+    # Errors go to stderr so they never mix with the paths, which may
+    # already include some found before the error.
+    writer = PathWriter(out)
+    error = None
     try:
-        # Parse the XML file
-        tree = ET.parse(xml_filepath)
-        root = tree.getroot()
-
-        # Find all 'Item' elements directly under the root
-        # Use findall with a relative XPath-like query
-        # './' ensures we search from the current node (root)
-        # Adjust the path if 'Item' is not directly under the root,
-        # e.g., use './/Item/...' to search anywhere below the root.
-
-        # Search for the specific nested structure
-        # Note: This assumes 'Item' is a direct child of the root.
-        # If 'Item' can be nested deeper, use './/Item/...' instead of './Item/...'
-        playlist_path_elements = root.findall('.//PlaylistItem/Path')
-
-        # --- Alternatively, if 'Item' might not be a direct child of root ---
-        # playlist_path_elements = root.findall('.//Item/PlaylistItems/PlaylistItem/Path')
-        # print("Using './/Item/...' search (finds 'Item' at any level)") # Uncomment if using this
-
-        for path_element in playlist_path_elements:
-            if path_element.text:
-                # Strip leading/trailing whitespace from the path text
-                found_paths.append(path_element.text.strip())
-            else:
-                # Handle cases where the <Path> tag exists but is empty
-                found_paths.append("[Empty Path Tag]")
-
-        if found_paths:
-            #print("Found Paths:")
-            for path in found_paths:
-                print(path)
-        #else:
-            #print("No paths found matching the structure 'Item/PlaylistItems/PlaylistItem/Path'")
-
-    except ET.ParseError as e:
-        print(f"Error parsing XML file: {e}")
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
+        if fast_scan:
+            extract_paths_regex(xml_filepath, writer.write_path)
+        elif etree is not None:
+            extract_paths_lxml(xml_filepath, writer.write_path)
+        else:
+            extract_paths_expat(xml_filepath, writer.write_path)
+    except PARSE_ERRORS as e:
+        error = f"Error parsing XML file '{xml_filepath}': {e}"
+    except FileNotFoundError:
+        error = f"Error: File '{xml_filepath}' not found."
+    except OSError as e:
+        # Directories, unreadable files and the like
+        error = f"Error reading file '{xml_filepath}': {e}"
+    except UnicodeDecodeError as e:
+        # The regex scan decodes each path itself
+        error = f"Error decoding XML file '{xml_filepath}': {e}"
+    except UnicodeEncodeError as e:
+        # A path the output encoding cannot represent
+        error = f"Error writing a path from '{xml_filepath}': {e}"
+    finally:
+        # Paths found before an error still go out
+        writer.flush()
+    if error:
+        print(error, file=sys.stderr)
 
 #    print("-" * (len(f"--- Parsing file: {xml_filepath} ---"))) # Print separator matching length
 
+def collect_playlist_paths(xml_filepath, fast_scan=False):
+    """Run find_playlist_paths on one file and return its output as bytes."""
+    output = io.BytesIO()
+    stream = io.TextIOWrapper(output, encoding=sys.stdout.encoding or 'utf-8',
+                              errors=sys.stdout.errors or 'strict')
+    find_playlist_paths(xml_filepath, stream, fast_scan)
+    stream.flush()
+    return output.getvalue()
+
+def find_playlist_paths_parallel(xml_filepaths, fast_scan=False):
+    """
+    Print the playlist paths of several XML files, parsing them in parallel.
+
+    Each file is handled by a worker process and its output is written as
+    one block, in the order the files were given.
+
+    Args:
+        xml_filepaths (list): Paths to the XML files.
+        fast_scan (bool): Passed on to find_playlist_paths.
+    """
+    collect = partial(collect_playlist_paths, fast_scan=fast_scan)
+    sys.stdout.flush()
+    with ProcessPoolExecutor() as executor:
+        for output in executor.map(collect, xml_filepaths, chunksize=4):
+            sys.stdout.buffer.write(output)
+    sys.stdout.buffer.flush()
+
+
+def find_playlist_paths_from_stdin(fast_scan=False):
+    """
+    Print the playlist paths of every file named on standard input.
+
+    Reads one file path per line, so a caller can process many playlists
+    with a single interpreter start-up instead of one process per file.
+
+    Args:
+        fast_scan (bool): Passed on to find_playlist_paths.
+    """
+    for line in sys.stdin:
+        xml_filepath = line.rstrip("\r\n")
+        if xml_filepath:
+            find_playlist_paths(xml_filepath, fast_scan=fast_scan)
+
 
 # --- Example Usage ---
 if __name__ == "__main__":
-    # Check if a filename was provided as a command-line argument
-    if len(sys.argv) > 1:
-        file_to_parse = sys.argv[1]
-        find_playlist_paths(file_to_parse)
+    arg_parser = argparse.ArgumentParser(
+        description="Print the PlaylistItem/Path entries of playlist XML files.")
+    arg_parser.add_argument("files", nargs="*", help="playlist XML files to read")
+    arg_parser.add_argument("--fast-scan", action="store_true",
+                            help="find <Path> elements with a regex instead of parsing the XML "
+                                 "(only safe for Jellyfin-generated playlist.xml files)")
+    arg_parser.add_argument("--stdin", action="store_true",
+                            help="read the playlist file paths from standard input, one per line")
+    args = arg_parser.parse_args()
+
+    if args.stdin:
+        find_playlist_paths_from_stdin(args.fast_scan)
+    # Check if filenames were provided as command-line arguments
+    elif len(args.files) > 1:
+        find_playlist_paths_parallel(args.files, args.fast_scan)
+    elif args.files:
+        file_to_parse = args.files[0]
+        find_playlist_paths(file_to_parse, fast_scan=args.fast_scan)
     else:
-        # --- Create a dummy XML file for demonstration if no argument is given ---
-        #print("No file specified. Creating a dummy 'example_playlist.xml' for demonstration.")
+        # --- Parse an example XML document if no argument is given ---
+        #print("No file specified. Parsing an example playlist for demonstration.")
         example_xml_content = """<?xml version="1.0" encoding="UTF-8"?>
 <PlaylistRoot>
   <Metadata>
@@ -114,15 +388,9 @@ if __name__ == "__main__":
   </NestedItem>
 </PlaylistRoot>
         """
-        dummy_filename = "example_playlist.xml"
-        try:
-            with open(dummy_filename, "w", encoding="utf-8") as f:
-                f.write(example_xml_content)
-            #print(f"Created '{dummy_filename}'.\n")
-            find_playlist_paths(dummy_filename)
-            #print("\nTo parse your own file, run:")
-            #print(f"python {os.path.basename(__file__)} your_file.xml")
-        except IOError as e:
-            print(f"Error creating dummy file: {e}")
-
-        # --- End of Dummy File Creation ---
+        # Parse the example from memory rather than writing it to disk first
+        find_playlist_paths(io.BytesIO(example_xml_content.encode("utf-8")))
+        #print("\nTo parse your own file, run:")
+        #print(f"python {os.path.basename(__file__)} your_file.xml")
+
+        # --- End of Example ---
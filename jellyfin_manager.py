@@ -1,10 +1,173 @@
 #!/usr/bin/env python3
 
+import json
 import os
 import sqlite3
+import sys
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
+from operator import itemgetter
 from simple_term_menu import TerminalMenu
+from playlist_manager import open_database
+
+# Seconds to wait for the Jellyfin server before giving up on a request
+REQUEST_TIMEOUT = 30
+
+# Stored ETag responses older than this many seconds are not revalidated,
+# and at most this many are kept
+ETAG_MAX_AGE = 7 * 24 * 60 * 60
+ETAG_MAX_ENTRIES = 64
+
+# Fields stored for scanned items, with the values used when Jellyfin
+# leaves one out
+ALBUM_FIELDS = itemgetter('Id', 'Name', 'Path', 'AlbumArtist')
+ALBUM_DEFAULTS = {'Id': 'N/A', 'Name': 'Unnamed', 'Path': '', 'AlbumArtist': 'Unnamed'}
+ITEM_FIELDS = itemgetter('Id', 'Name', 'Path', 'Type', 'ParentId')
+ITEM_DEFAULTS = {'Id': 'N/A', 'Name': 'Unnamed', 'Path': '', 'Type': 'Unknown', 'ParentId': ''}
+# Tracks are stored under their album, which is not always their ParentId
+# (disc subfolders, for example)
+TRACK_FIELDS = itemgetter('Id', 'Name', 'Path', 'Type', 'AlbumId')
+TRACK_DEFAULTS = {'Id': 'N/A', 'Name': 'Unnamed', 'Path': '', 'Type': 'Unknown', 'AlbumId': ''}
+
+
+def item_row(fields, item, defaults):
+    """Return the fields of an item as a tuple, filling in defaults for missing keys."""
+    try:
+        return fields(item)
+    except KeyError:
+        return fields({**defaults, **item})
+
+
+def format_search_result(item):
+    """Format a Jellyfin search result as a menu entry, truncating long paths."""
+    item_path = item.get("Path", "No path")
+    if len(item_path) > 60:
+        item_path = item_path[:57] + "..."
+    return f"[{item.get('Type', 'Unknown')}] {item.get('Name', 'Unnamed')} - {item_path}"
+
+
+def escape_menu_entry(text):
+    """Escape the '|' that TerminalMenu treats as the start of an entry's preview data."""
+    return text.replace('|', '\\|')
+
+
+def format_item_preview(item, has_albumartist):
+    """Format the album artist and path of a jellyfin_items row for a menu preview."""
+    lines = []
+    if has_albumartist and item['albumartist']:
+        lines.append(f"Album Artist: {item['albumartist']}")
+    lines.append(f"Path: {item['path'] or 'No path'}")
+    return "\n".join(lines)
+
+
+def write_lines(lines):
+    """Write lines to stdout in a single write, flushing once."""
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
+
+
+def ask_yes_no(prompt):
+    """Ask a y/n question, returning True if the answer starts with 'y'."""
+    return input(prompt).strip()[:1] in ('y', 'Y')
+
+
+@lru_cache(maxsize=1024)
+def dir_entries(directory):
+    """Return the names in a directory, or None if it cannot be read.
+    
+    Cached so browsing siblings costs one directory read rather than a
+    stat() per item, which matters on network mounts. The cache is cleared
+    at the start of each listing so it never outlives the menu it serves.
+    """
+    try:
+        return frozenset(os.listdir(directory))
+    except OSError:
+        return None
+
+
+def path_exists(path):
+    """Check whether a path exists using the cached listing of its directory.
+    
+    Names missing from the listing, and directories that cannot be listed,
+    are checked with os.path.exists, so case-insensitive mounts and folders
+    added since the listing was read are still found.
+    """
+    directory, name = os.path.split(os.path.normpath(path))
+    if name:
+        entries = dir_entries(directory)
+        if entries is not None and name in entries:
+            return True
+    return os.path.exists(path)
+
+
+# Query for the direct children of an item; only ParentId varies
+CHILD_QUERY = {
+    "Recursive": "false",
+    "Fields": "Path,Name,Type,RunTimeTicks",
+    "SortBy": "Name",
+    "SortOrder": "Ascending",
+    "EnableImages": "false",
+    "EnableUserData": "false"
+}
+
+# Stores a path under a category, recording the Jellyfin user if one was
+# selected. Existing rows are updated in place rather than deleted and
+# reinserted, and keep their user when none is selected.
+INSERT_FOLDER_SQL = '''
+    INSERT INTO folders (path, category_id, user_name) VALUES (?, ?, ?)
+    ON CONFLICT(path) DO UPDATE SET
+        category_id = excluded.category_id,
+        user_name = COALESCE(excluded.user_name, folders.user_name)
+'''
+
+
+# Number of items listed per page when browsing by type
+TYPE_PAGE_SIZE = 100
+
+# Number of album IDs sent in each AlbumIds filter when fetching tracks,
+# keeping the request URL a reasonable length
+ALBUM_ID_BATCH_SIZE = 100
+
+# Header of the child item table shown by process_selected_item
+CHILD_TABLE_HEADER = "\nName                          | Type       | Duration\n" + "-" * 70
+
+
+def format_child_row(child):
+    """Format a child item as a row of the child item table."""
+    # Convert ticks (100-nanosecond units) to whole seconds
+    ticks = child.get('RunTimeTicks', 0)
+    if ticks:
+        total_seconds = ticks // 10_000_000
+        duration_str = f"{total_seconds // 60}:{total_seconds % 60:02d}"
+    else:
+        duration_str = "N/A"
+    return f"{child.get('Name', 'N/A')[:30]:<30} | {child.get('Type', 'N/A'):<10} | {duration_str}"
+
+
+@lru_cache(maxsize=4096)
+def format_iso_date(value, fmt):
+    """Format an ISO 8601 date from Jellyfin, returning it unchanged if it cannot be parsed.
+    
+    Results are cached since many items share the same timestamp, for
+    example albums imported together.
+    """
+    try:
+        # Python 3.11+ accepts the trailing 'Z' directly
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return value
+    except TypeError:
+        return value
+    return parsed.strftime(fmt)
+
 
 class JellyfinManager:
     """Class to manage Jellyfin API interactions and database operations"""
@@ -18,6 +181,157 @@ class JellyfinManager:
             "X-MediaBrowser-Token": self.api_key,
             "Content-Type": "application/json"
         }
+        # Endpoint URLs built once rather than on every request
+        base_url = self.server_url.rstrip('/')
+        self.items_url = f"{base_url}/Items"
+        self.users_url = f"{base_url}/Users"
+        # One session keeps connections to the server alive between requests
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=3)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # Jellyfin user chosen in select_user, if any
+        self.selected_user_id = None
+        self.selected_user_name = None
+        # Database connection, opened on first use and kept for reuse
+        self.conn = None
+        # Categories and their menu entries, reloaded when the database changes
+        self.categories = None
+        self.category_menu = None
+        self.categories_version = None
+        # Category menus keyed by title, rebuilt with the categories
+        self.category_selectors = {}
+        # Item types and their menu for filter_by_type, dropped when items
+        # are scanned
+        self.type_menu = None
+        # Background requests for child listings, keyed by parent item ID
+        self.pool = ThreadPoolExecutor(max_workers=4)
+        self.child_prefetch = {}
+        # Decoded JSON of successful GET responses keyed by URL and parameters
+        self.cache = {}
+        # Guards the http_cache table, which cached_get also uses from
+        # worker threads
+        self.etag_lock = threading.Lock()
+        
+        # Bring the database up to date before anything reads from it
+        self.ensure_schema()
+        
+    def ensure_schema(self):
+        """Add the tables and columns this class needs to the database."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        # ETags and bodies of cached endpoints, so unchanged responses can be
+        # revalidated across sessions
+        with conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS http_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    etag TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    stored_at REAL NOT NULL
+                )
+            ''')
+        
+        # Folders are stored with INSERT_FOLDER_SQL, which always names
+        # user_name; databases from before that column lack it
+        cursor.execute("PRAGMA table_info(folders)")
+        folder_columns = {column[1] for column in cursor.fetchall()}
+        if folder_columns and 'user_name' not in folder_columns:
+            with conn:
+                conn.execute('ALTER TABLE folders ADD COLUMN user_name TEXT')
+            print("Added user_name column to folders table")
+        
+        cursor.execute("PRAGMA table_info(jellyfin_items)")
+        columns = {column[1] for column in cursor.fetchall()}
+        
+        # The table is created by PlaylistManager; nothing to do without it
+        if not columns:
+            self.has_albumartist = False
+            return
+        
+        if 'albumartist' not in columns:
+            with conn:
+                conn.execute('ALTER TABLE jellyfin_items ADD COLUMN albumartist TEXT')
+            print("Added albumartist column to jellyfin_items table")
+        # The browse views check this instead of querying the schema again
+        self.has_albumartist = True
+        
+    def get_connection(self):
+        """Return the shared database connection, opening it on first use."""
+        if self.conn is None:
+            # sqlite3 keeps compiled statements keyed by their SQL text; the
+            # menus reuse a fixed set of queries, so keep more of them around
+            # cached_get also reads and writes http_cache from worker threads
+            self.conn = open_database(self.db_file, cached_statements=256, check_same_thread=False)
+        return self.conn
+        
+    def cached_get(self, url, params=None, ttl=60):
+        """GET a slow-changing endpoint and return its decoded JSON, reusing it for ttl seconds.
+        
+        Raises requests.exceptions.RequestException if the request fails or
+        the server returns an error status.
+        """
+        key = (url, tuple(sorted((params or {}).items())))
+        cached = self.cache.get(key)
+        if cached and time.monotonic() - cached[0] < ttl:
+            return cached[1]
+        
+        # Ask the server to send the body only if it changed since last time
+        cache_key = repr(key)
+        stored = self.load_etag(cache_key)
+        headers = {"If-None-Match": stored[0]} if stored else None
+        
+        response = self.session.get(url, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
+        if response.status_code == 304 and stored:
+            # Unchanged, so the stored body is still current
+            data = json.loads(stored[1])
+            self.touch_etag(cache_key)
+        else:
+            response.raise_for_status()
+            data = response.json()
+            if response.headers.get('ETag'):
+                self.store_etag(cache_key, response.headers['ETag'], response.text)
+        
+        self.cache[key] = (time.monotonic(), data)
+        return data
+        
+    def load_etag(self, cache_key):
+        """Return the stored (etag, body) for a key, or None if missing, expired or unreadable."""
+        try:
+            with self.etag_lock:
+                return self.get_connection().execute(
+                    'SELECT etag, body FROM http_cache WHERE cache_key = ? AND stored_at > ?',
+                    (cache_key, time.time() - ETAG_MAX_AGE)
+                ).fetchone()
+        except sqlite3.Error:
+            # The table is only a cache, so any problem is a miss
+            return None
+        
+    def touch_etag(self, cache_key):
+        """Mark a stored response as just revalidated so it does not expire."""
+        try:
+            with self.etag_lock, self.get_connection() as conn:
+                conn.execute('UPDATE http_cache SET stored_at = ? WHERE cache_key = ?',
+                             (time.time(), cache_key))
+        except sqlite3.Error:
+            pass
+        
+    def store_etag(self, cache_key, etag, body):
+        """Store a response body under its ETag, keeping the newest ETAG_MAX_ENTRIES entries."""
+        try:
+            with self.etag_lock, self.get_connection() as conn:
+                conn.execute('INSERT OR REPLACE INTO http_cache (cache_key, etag, body, stored_at) VALUES (?, ?, ?, ?)',
+                             (cache_key, etag, body, time.time()))
+                conn.execute('''
+                    DELETE FROM http_cache WHERE cache_key NOT IN (
+                        SELECT cache_key FROM http_cache ORDER BY stored_at DESC LIMIT ?
+                    )
+                ''', (ETAG_MAX_ENTRIES,))
+        except sqlite3.Error:
+            # Failing to cache a response is not an error for the caller
+            pass
         
     def validate_api_key(self):
         """Check if API key is valid"""
@@ -41,59 +355,46 @@ class JellyfinManager:
         print(f"Connecting to Jellyfin server at: {self.server_url}")
         
         try:
-            # Make the API request to get users
-            endpoint = f"{self.server_url}/Users"
-            response = requests.get(endpoint, headers=self.headers)
+            # Make the API request to get users; error statuses raise
+            users = self.cached_get(self.users_url)
             
-            # Check if request was successful
-            if response.status_code == 200:
-                users = response.json()
-                
-                if not users:
-                    print("No users found.")
-                    input("\nPress Enter to Continue")
-                    return False
-                else:
-                    # Create a menu of users
-                    user_menu = []
-                    for user in users:
-                        user_id = user.get('Id', 'N/A')
-                        name = user.get('Name', 'N/A')
-                        last_login = user.get('LastLoginDate', 'Never')
-                        
-                        # Format the last login date if it exists
-                        if last_login != 'Never':
-                            try:
-                                # Parse ISO 8601 date format
-                                last_login_date = datetime.fromisoformat(last_login.replace('Z', '+00:00'))
-                                last_login = last_login_date.strftime('%Y-%m-%d %H:%M')
-                            except:
-                                pass
-                        
-                        user_menu.append(f"{name} (Last login: {last_login})")
-                    
-                    
-                    # Show the menu
-                    terminal_menu = TerminalMenu(user_menu, title="Select a user to view their music libraries:")
-                    menu_index = terminal_menu.show()
-                    
-                    if menu_index is None:
-                        return True
-                    
-                    # User selected a user, show their views
-                    selected_user = users[menu_index]
-                    selected_user_id = selected_user.get('Id')
-                    selected_user_name = selected_user.get('Name')
+            if not users:
+                print("No users found.")
+                input("\nPress Enter to Continue")
+                return False
+            else:
+                # Create a menu of users
+                user_menu = []
+                for user in users:
+                    user_id = user.get('Id', 'N/A')
+                    name = user.get('Name', 'N/A')
+                    last_login = user.get('LastLoginDate', 'Never')
                     
-                    # Store for later use
-                    self.selected_user_id = selected_user_id
-                    self.selected_user_name = selected_user_name
+                    # Format the last login date if it exists
+                    if last_login != 'Never':
+                        last_login = format_iso_date(last_login, '%Y-%m-%d %H:%M')
                     
-                    # Get this user's views
+                    user_menu.append(f"{name} (Last login: {last_login})")
+                
+                
+                # Show the menu
+                terminal_menu = TerminalMenu(user_menu, title="Select a user to view their music libraries:")
+                menu_index = terminal_menu.show()
+                
+                if menu_index is None:
                     return True
-            else:
-                print(f"Error connecting to Jellyfin API. Status code: {response.status_code}")
-                print(f"Response: {response.text}")
+                
+                # User selected a user, show their views
+                selected_user = users[menu_index]
+                selected_user_id = selected_user.get('Id')
+                selected_user_name = selected_user.get('Name')
+                
+                # Store for later use
+                self.selected_user_id = selected_user_id
+                self.selected_user_name = selected_user_name
+                
+                # Get this user's views
+                return True
         
         except requests.exceptions.RequestException as e:
             print(f"Error connecting to Jellyfin server: {e}")
@@ -108,54 +409,74 @@ class JellyfinManager:
     def list_user_libraries(self, user_id, user_name):
         """List music libraries for the given user"""
         # Get this user's views
-        view_endpoint = f"{self.server_url}/Users/{user_id}/Views"
-        view_response = requests.get(view_endpoint, headers=self.headers)
+        view_endpoint = f"{self.users_url}/{user_id}/Views"
+        try:
+            views = self.cached_get(view_endpoint).get("Items", [])
+        except requests.exceptions.RequestException as e:
+            print(f"Error getting user views: {e}")
+            input("\nPress Enter to Continue")
+            return True
         
-        if view_response.status_code == 200:
-            views = view_response.json().get("Items", [])
-            
-            # Filter to only music libraries
-            music_views = []
-            for view in views:
-                collection_type = view.get("CollectionType", "")
-                if collection_type.lower() == "music":
-                    music_views.append(view)
-            
-            if not music_views:
-                print(f"No music libraries found for user {user_name}.")
-                input("\nPress Enter to Continue")
-                return True
+        # Filter to only music libraries
+        music_views = [view for view in views if view.get("CollectionType", "").lower() == "music"]
+        
+        if not music_views:
+            print(f"No music libraries found for user {user_name}.")
+            input("\nPress Enter to Continue")
+            return True
+        
+        # Request the counts of every music library at once; they label
+        # the menu and stay cached for when a library is picked
+        stats_endpoint = f"{self.items_url}/Counts"
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            stats_futures = [
+                executor.submit(self.cached_get, stats_endpoint,
+                                {"UserId": user_id, "ParentId": view.get("Id")}, 300)
+                for view in music_views
+            ]
+        
+        # Create menu of music libraries
+        library_menu = []
+        for view, stats_future in zip(music_views, stats_futures):
+            view_name = view.get("Name", "Unnamed")
+            try:
+                stats = stats_future.result()
+            except requests.exceptions.RequestException:
+                stats = None
             
-            # Create menu of music libraries
-            library_menu = []
-            for view in music_views:
-                view_name = view.get("Name", "Unnamed")
+            if stats is not None:
+                album_count = stats.get("AlbumCount", 0)
+                library_menu.append(f"{view_name} ({album_count} albums)")
+            else:
                 item_count = view.get("ChildCount", 0)
                 library_menu.append(f"{view_name} ({item_count} items)")
-            
-            library_menu.append("Back to User Selection")
-            
-            # Show the menu
-            library_menu_title = f"Music libraries for user {user_name}:"
-            library_terminal_menu = TerminalMenu(library_menu, title=library_menu_title)
+        
+        library_menu.append("Back to User Selection")
+        
+        # Show the menu until the user goes back to user selection
+        library_menu_title = f"Music libraries for user {user_name}:"
+        library_terminal_menu = TerminalMenu(library_menu, title=library_menu_title)
+        while True:
             library_index = library_terminal_menu.show()
-            
+                
             if library_index is None or library_index == len(music_views):
-                return self.list_users()  # Back to user selection
-            
+                return True  # Back to user selection
+                
             # User selected a library, show details
             selected_library = music_views[library_index]
             library_id = selected_library.get("Id")
             library_name = selected_library.get("Name")
             
-            # Get stats for this library
-            stats_endpoint = f"{self.server_url}/Items/Counts?UserId={user_id}&ParentId={library_id}"
-            stats_response = requests.get(stats_endpoint, headers=self.headers)
+            # Get stats for this library, normally already cached above
+            stats_params = {"UserId": user_id, "ParentId": library_id}
+            try:
+                stats = self.cached_get(stats_endpoint, stats_params, ttl=300)
+            except requests.exceptions.RequestException:
+                stats = None
             
             print(f"\nLibrary: {library_name}")
             
-            if stats_response.status_code == 200:
-                stats = stats_response.json()
+            if stats is not None:
                 album_count = stats.get("AlbumCount", 0)
                 artist_count = stats.get("ArtistCount", 0)
                 song_count = stats.get("SongCount", 0)
@@ -182,26 +503,21 @@ class JellyfinManager:
             
             # Back to library selection
             input("\nPress Enter to Continue")
-            return self.list_user_libraries(user_id, user_name)
-            
-        else:
-            print(f"Error getting user views: {view_response.status_code}")
-            input("\nPress Enter to Continue")
-            
-        return True
         
     def scan_library(self, library_id, user_id, library_name):
         """Scan a specific library for music albums"""
         print(f"\nScanning library {library_name}...")
         
+        # Library contents are changing, so drop any cached counts
+        self.cache.clear()
+        self.type_menu = None
+        
         # Clear database first?
-        clear_db = input("Clear existing database items first? (y/n): ")
-        if clear_db.lower() == 'y':
-            conn = sqlite3.connect(self.db_file)
-            cursor = conn.cursor()
-            cursor.execute('DELETE FROM jellyfin_items')
-            conn.commit()
-            conn.close()
+        clear_db = ask_yes_no("Clear existing database items first? (y/n): ")
+        if clear_db:
+            conn = self.get_connection()
+            with conn:
+                conn.execute('DELETE FROM jellyfin_items')
             print("Database cleared.")
         
         # Get albums from this library
@@ -212,61 +528,47 @@ class JellyfinManager:
             "Fields": "Path,Name,Type,ParentId",
             "SortBy": "SortName",
             "SortOrder": "Ascending",
-            "IncludeItemTypes": "MusicAlbum",
-            "Limit": 2000
+            "IncludeItemTypes": "MusicAlbum"
         }
         
-        album_endpoint = f"{self.server_url}/Items"
-        album_response = requests.get(album_endpoint, headers=self.headers, params=scan_params)
+        # Store albums in database
+        conn = self.get_connection()
+        cursor = conn.cursor()
         
-        if album_response.status_code == 200:
-            all_items = album_response.json().get("Items", [])
-            # Filter out items of type "Audio"
-            albums = [item for item in all_items if item.get("Type", "") == "MusicAlbum"]
-            print(f"Found {len(albums)} albums in library {library_name}.")
-            
-            # Store albums in database
-            conn = sqlite3.connect(self.db_file)
-            cursor = conn.cursor()
-            
-            albums_stored = 0
-            tracks_stored = 0
-            
-            for album in albums:
-                album_id = album.get('Id', 'N/A')
-                album_name = album.get('Name', 'Unnamed')
-                album_artist = album.get('AlbumArtist', 'Unnamed')
-                album_path = album.get('Path', '')
-                
-                # Store album
-                try:
-                    # Check if we need to alter the table to add albumartist column
-                    cursor.execute("PRAGMA table_info(jellyfin_items)")
-                    columns = [column[1] for column in cursor.fetchall()]
-                    
-                    if 'albumartist' not in columns:
-                        cursor.execute('ALTER TABLE jellyfin_items ADD COLUMN albumartist TEXT')
-                        conn.commit()
-                        print("Added albumartist column to jellyfin_items table")
-                    
-                    # Now store with albumartist
-                    cursor.execute('''
+        albums_found = 0
+        albums_stored = 0
+        
+        # Write each page of albums as it arrives so only one page is held in
+        # memory; IncludeItemTypes already limits the results to albums. All
+        # pages are stored in a single transaction.
+        try:
+            with conn:
+                for page in self.paged_items(scan_params):
+                    albums_found += len(page)
+                    album_rows = [
+                        item_row(ALBUM_FIELDS, album, ALBUM_DEFAULTS) + ("MusicAlbum", library_id)
+                        for album in page
+                    ]
+                    cursor.executemany('''
                         INSERT OR REPLACE INTO jellyfin_items 
-                        (item_id, title, path, type, parent_id, albumartist) 
+                        (item_id, title, path, albumartist, type, parent_id) 
                         VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (album_id, album_name, album_path, "MusicAlbum", library_id, album_artist))
-                    conn.commit()
-                    albums_stored += 1
-                    
-                except Exception as e:
-                    print(f"Error storing album {album_name}: {e}")
-            
-            print(f"\nScan complete!")
-            print(f"Albums stored: {albums_stored}")
-            
-            conn.close()
-        else:
-            print(f"Error fetching albums: {album_response.status_code}")
+                    ''', album_rows)
+                    albums_stored += len(album_rows)
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching albums: {e}")
+            return
+        except sqlite3.Error as e:
+            print(f"Error storing albums: {e}")
+            albums_stored = 0
+        
+        print(f"Found {albums_found} albums in library {library_name}.")
+        
+        # Refresh the planner statistics now the table contents have changed
+        conn.execute('ANALYZE')
+        
+        print(f"\nScan complete!")
+        print(f"Albums stored: {albums_stored}")
             
     def browse_recent_albums(self, library_id, user_id, library_name):
         """Browse recently added albums in a library"""
@@ -282,8 +584,8 @@ class JellyfinManager:
             "Limit": 20
         }
         
-        recent_endpoint = f"{self.server_url}/Items"
-        recent_response = requests.get(recent_endpoint, headers=self.headers, params=recent_params)
+        recent_endpoint = self.items_url
+        recent_response = self.session.get(recent_endpoint, params=recent_params, timeout=REQUEST_TIMEOUT)
         
         if recent_response.status_code == 200:
             recent_albums = recent_response.json().get("Items", [])
@@ -293,6 +595,21 @@ class JellyfinManager:
             else:
                 print(f"\nRecently added albums in {library_name}:")
                 
+                # Look up the category of every listed album in one query
+                paths = [album.get("Path") for album in recent_albums if album.get("Path")]
+                cat_by_path = self.get_folder_categories(self.get_connection().cursor(), paths)
+                
+                # Read each parent directory once, concurrently since each read
+                # can block on a network mount, then check the paths against
+                # the listings
+                dir_entries.cache_clear()
+                parents = {os.path.dirname(os.path.normpath(path)) for path in paths}
+                if parents:
+                    with ThreadPoolExecutor(max_workers=len(parents)) as executor:
+                        list(executor.map(dir_entries, parents))
+                exists_map = {path: path_exists(path) for path in paths}
+                
+                lines = []
                 for album in recent_albums:
                     album_name = album.get("Name", "Unnamed")
                     album_path = album.get("Path", "No path")
@@ -300,36 +617,23 @@ class JellyfinManager:
                     
                     # Format date
                     if date_created != "Unknown":
-                        try:
-                            created_date = datetime.fromisoformat(date_created.replace('Z', '+00:00'))
-                            date_str = created_date.strftime('%Y-%m-%d')
-                        except:
-                            date_str = date_created
+                        date_str = format_iso_date(date_created, '%Y-%m-%d')
                     else:
                         date_str = "Unknown"
                     
-                    print(f"{album_name} (Added: {date_str})")
+                    lines.append(f"{album_name} (Added: {date_str})")
                     if album_path:
-                        print(f"  Path: {album_path}")
+                        lines.append(f"  Path: {album_path}")
                         
                         # Check if path exists and is in database
-                        if os.path.exists(album_path):
-                            # Check if in database
-                            conn = sqlite3.connect(self.db_file)
-                            cursor = conn.cursor()
-                            
-                            cursor.execute('SELECT category_id FROM folders WHERE path = ?', (album_path,))
-                            folder = cursor.fetchone()
-                            
-                            if folder:
-                                cursor.execute('SELECT name FROM categories WHERE id = ?', (folder[0],))
-                                category = cursor.fetchone()
-                                print(f"  In category: {category[0]}")
+                        if exists_map.get(album_path, False):
+                            category_name = cat_by_path.get(album_path)
+                            if category_name:
+                                lines.append(f"  In category: {category_name}")
                             else:
-                                print("  Not in any playlist category")
-                            
-                            conn.close()
-                    print()
+                                lines.append("  Not in any playlist category")
+                    lines.append("")
+                write_lines(lines)
         else:
             print(f"Error fetching recent albums: {recent_response.status_code}")
             
@@ -341,18 +645,22 @@ class JellyfinManager:
         print("\n---------Scanning Jellyfin Music Albums---------")
         print(f"Connecting to Jellyfin server at: {self.server_url}")
         
+        # Library contents are changing, so drop any cached counts
+        self.cache.clear()
+        self.type_menu = None
+        
         # Set up progress indicators
-        total_items_found = 0
         total_items_stored = 0
         
+        # Connect to database
+        conn = self.get_connection()
+        
         try:
-            # Connect to database
-            conn = sqlite3.connect(self.db_file)
             cursor = conn.cursor()
             
             # First, clear existing items to ensure fresh data (optional)
-            clear_existing = input("Clear existing item data before scanning? (y/n): ")
-            if clear_existing.lower() == 'y':
+            clear_existing = ask_yes_no("Clear existing item data before scanning? (y/n): ")
+            if clear_existing:
                 cursor.execute('DELETE FROM jellyfin_items')
                 print("Cleared existing item data.")
             
@@ -362,100 +670,58 @@ class JellyfinManager:
                 "Fields": "Path,Name,Type,ParentId",
                 "SortBy": "SortName",
                 "SortOrder": "Ascending",
-                "IncludeItemTypes": "MusicAlbum",
-                "Limit": 2000
+                "IncludeItemTypes": "MusicAlbum"
             }
             
-            endpoint = f"{self.server_url}/Items"
-            response = requests.get(endpoint, headers=self.headers, params=params)
+            # Handle the albums a page at a time so the whole album list is
+            # never held in memory; every page goes into the same transaction
+            # and is committed once the scan completes
+            insert_sql = '''
+                INSERT OR REPLACE INTO jellyfin_items 
+                (item_id, title, path, type, parent_id) 
+                VALUES (?, ?, ?, ?, ?)
+            '''
+            total_albums = 0
+            total_tracks = 0
+            album_ids = []
             
-            if response.status_code != 200:
-                print(f"Error connecting to Jellyfin API. Status code: {response.status_code}")
-                print(f"Response: {response.text}")
-                conn.close()
-                return False
+            print("Processing music albums...")
             
-            root_items = response.json().get("Items", [])
-            print(f"Found {len(root_items)} music albums.")
+            for page in self.paged_items(params):
+                album_rows = [item_row(ITEM_FIELDS, album, ITEM_DEFAULTS) for album in page]
+                cursor.executemany(insert_sql, album_rows)
+                album_ids.extend(row[0] for row in album_rows)
+                total_albums += len(album_rows)
+                print(f"Processed {total_albums} albums...")
             
-            # Process each album and its tracks
-            total_albums = len(root_items)
-            total_tracks = 0
+            # Fetch the tracks of the scanned albums with one query per batch
+            # of albums rather than one request per album
+            track_params = {
+                "Recursive": "true",
+                "Fields": "Path,Name,Type",
+                "IncludeItemTypes": "Audio"
+            }
             
-            print(f"Processing {total_albums} music albums...")
+            print("Processing tracks...")
             
-            # First, store all albums
-            for album_index, album in enumerate(root_items):
-                # Extract album details
-                album_id = album.get('Id', 'N/A')
-                album_name = album.get('Name', 'Unnamed')
-                album_path = album.get('Path', '')
-                album_type = album.get('Type', 'Unknown')
-                parent_id = album.get('ParentId', '')
-                
-                # Store album in database
-                try:
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO jellyfin_items 
-                        (item_id, title, path, type, parent_id) 
-                        VALUES (?, ?, ?, ?, ?)
-                    ''', (album_id, album_name, album_path, album_type, parent_id))
-                    
-                    conn.commit()
-                    total_items_stored += 1
-                    total_items_found += 1
-                    
-                    # Print progress every 20 albums
-                    if album_index > 0 and album_index % 20 == 0:
-                        print(f"Processed {album_index} of {total_albums} albums...")
-                    
-                except sqlite3.Error as e:
-                    print(f"Database error storing album {album_id}: {e}")
-                    continue
-                
-                # Get the album's tracks
-                child_params = {
-                    "ParentId": album_id,
-                    "Recursive": "false",
-                    "Fields": "Path,Name,Type,ParentId",
-                    "SortBy": "SortName",
-                    "SortOrder": "Ascending",
-                    "IncludeItemTypes": "Audio",
-                    "Limit": 1000
-                }
-                
+            for start in range(0, len(album_ids), ALBUM_ID_BATCH_SIZE):
+                batch = album_ids[start:start + ALBUM_ID_BATCH_SIZE]
+                batch_params = dict(track_params, AlbumIds=",".join(batch))
+                # A failed batch is reported and skipped, keeping the tracks
+                # already stored
                 try:
-                    child_response = requests.get(endpoint, headers=self.headers, params=child_params)
-                    
-                    if child_response.status_code == 200:
-                        tracks = child_response.json().get("Items", [])
-                        album_track_count = len(tracks)
-                        total_tracks += album_track_count
-                        
-                        # Store each track
-                        for track in tracks:
-                            track_id = track.get('Id', 'N/A')
-                            track_name = track.get('Name', 'Unnamed')
-                            track_path = track.get('Path', '')
-                            track_type = track.get('Type', 'Unknown')
-                            
-                            try:
-                                cursor.execute('''
-                                    INSERT OR REPLACE INTO jellyfin_items 
-                                    (item_id, title, path, type, parent_id) 
-                                    VALUES (?, ?, ?, ?, ?)
-                                ''', (track_id, track_name, track_path, track_type, album_id))
-                                
-                                conn.commit()
-                                total_items_stored += 1
-                                total_items_found += 1
-                            except sqlite3.Error as e:
-                                print(f"Database error storing track {track_id}: {e}")
-                        
-                        if album_track_count > 0:
-                            print(f"Album '{album_name}' has {album_track_count} tracks")
-                except Exception as e:
-                    print(f"Error fetching tracks for album {album_name}: {e}")
+                    for page in self.paged_items(batch_params, page_size=1000):
+                        track_rows = [item_row(TRACK_FIELDS, track, TRACK_DEFAULTS) for track in page]
+                        cursor.executemany(insert_sql, track_rows)
+                        total_tracks += len(track_rows)
+                except requests.exceptions.RequestException as e:
+                    print(f"Error fetching tracks for albums {start + 1}-{start + len(batch)}: {e}")
+            
+            conn.commit()
+            total_items_stored = total_albums + total_tracks
+            
+            # Refresh the planner statistics now the table contents have changed
+            conn.execute('ANALYZE')
             
             print(f"\nScan complete!")
             print(f"Total albums: {total_albums}")
@@ -466,9 +732,8 @@ class JellyfinManager:
             cursor.execute('SELECT type, COUNT(*) FROM jellyfin_items GROUP BY type ORDER BY COUNT(*) DESC')
             type_counts = cursor.fetchall()
             
-            print("\nItem types in database:")
-            for item_type, count in type_counts:
-                print(f"  {item_type}: {count} items")
+            write_lines(["\nItem types in database:"] +
+                        [f"  {item_type}: {count} items" for item_type, count in type_counts])
             
         except requests.exceptions.RequestException as e:
             print(f"Error connecting to Jellyfin server: {e}")
@@ -477,11 +742,42 @@ class JellyfinManager:
         except Exception as e:
             print(f"An unexpected error occurred: {e}")
         finally:
-            conn.close()
+            # Discard a pending clear if the scan did not complete
+            conn.rollback()
         
         input("\nPress Enter to Continue")
         return True
     
+    def fetch_items_page(self, params, start_index, limit):
+        """Request one page of items from the Jellyfin API."""
+        page_params = dict(params, StartIndex=start_index, Limit=limit)
+        response = self.session.get(self.items_url, params=page_params, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+    
+    def paged_items(self, params, page_size=200):
+        """Yield the items matching params one page at a time.
+        
+        The next page is requested in the background while the caller
+        processes the current one. Raises requests.exceptions.HTTPError if
+        the server returns an error status.
+        """
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            start_index = 0
+            future = executor.submit(self.fetch_items_page, params, start_index, page_size)
+            while future is not None:
+                data = future.result()
+                items = data.get("Items", [])
+                start_index += len(items)
+                total = data.get("TotalRecordCount", start_index)
+                
+                # Request the next page before handing this one over
+                if len(items) == page_size and start_index < total:
+                    future = executor.submit(self.fetch_items_page, params, start_index, page_size)
+                else:
+                    future = None
+                yield items
+    
     def search_path(self):
         """Search for a path in Jellyfin using the GetItems API and allow selecting from database paths."""
         if not self.validate_api_key():
@@ -496,14 +792,20 @@ class JellyfinManager:
             "Back to Main Menu"
         ]
         search_menu = TerminalMenu(search_options, title="Select search method:")
-        search_index = search_menu.show()
         
-        if search_index == 0:  # Search by keyword
-            return self.search_by_keyword()
-        elif search_index == 1:  # Browse from database
-            return self.select_path_from_database()
-        else:  # Back or None
-            return False
+        # The search methods return None when the user asks to go back here
+        while True:
+            search_index = search_menu.show()
+            
+            if search_index == 0:  # Search by keyword
+                result = self.search_by_keyword()
+            elif search_index == 1:  # Browse from database
+                result = self.select_path_from_database()
+            else:  # Back or None
+                return False
+            
+            if result is not None:
+                return result
     
     def search_by_keyword(self):
         """Search for items in Jellyfin by keyword."""
@@ -534,8 +836,8 @@ class JellyfinManager:
             if path_filter:
                 params["Path"] = path_filter
             
-            endpoint = f"{self.server_url}/Items"
-            response = requests.get(endpoint, headers=self.headers, params=params)
+            endpoint = self.items_url
+            response = self.session.get(endpoint, params=params, timeout=REQUEST_TIMEOUT)
             
             # Check if request was successful
             if response.status_code == 200:
@@ -547,21 +849,8 @@ class JellyfinManager:
                 else:
                     print(f"Found {len(items)} items:")
                     
-                    # Create a menu of search results
-                    item_menu = []
-                    for item in items:
-                        item_type = item.get("Type", "Unknown")
-                        item_name = item.get("Name", "Unnamed")
-                        item_path = item.get("Path", "No path")
-                        
-                        # Truncate path for display if needed
-                        if len(item_path) > 60:
-                            display_path = item_path[:57] + "..."
-                        else:
-                            display_path = item_path
-                        
-                        item_menu.append(f"[{item_type}] {item_name} - {display_path}")
-                    
+                    # Create a menu of search results; TerminalMenu needs a list
+                    item_menu = list(map(format_search_result, items))
                     item_menu.append("Back to Search")
                     
                     # Display menu and get user choice
@@ -570,7 +859,7 @@ class JellyfinManager:
                     
                     if menu_index is None or menu_index == len(items):
                         print("No item selected. Returning to search menu.")
-                        return self.search_path()
+                        return None
                     
                     # Process the selected item
                     selected_item = items[menu_index]
@@ -592,7 +881,7 @@ class JellyfinManager:
     
     def select_path_from_database(self):
         """Select a path from the database to use with Jellyfin."""
-        conn = sqlite3.connect(self.db_file)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         # Get all paths from database
@@ -604,23 +893,26 @@ class JellyfinManager:
         ''')
         
         folders = cursor.fetchall()
-        conn.close()
         
         if not folders:
             print("No paths found in database. Please add paths first.")
             input("Press Enter to Continue")
             return False
         
-        # Create a menu of folder paths grouped by category
+        # Create a menu of folder paths grouped by category, recording which
+        # folder each menu entry refers to (None for headers and separators)
         folder_menu = []
+        folder_index_by_menu = []
         current_category = None
         
-        for path, category in folders:
+        for folder_index, (path, category) in enumerate(folders):
             # Add category header if we've moved to a new category
             if category != current_category:
                 if current_category is not None:
                     folder_menu.append("──────────────────────────────────────────")
+                    folder_index_by_menu.append(None)
                 folder_menu.append(f"== {category} ==")
+                folder_index_by_menu.append(None)
                 current_category = category
             
             # Truncate path for display
@@ -630,33 +922,26 @@ class JellyfinManager:
                 display_path = path
                 
             folder_menu.append(f"{display_path}")
+            folder_index_by_menu.append(folder_index)
         
         folder_menu.append("──────────────────────────────────────────")
         folder_menu.append("Back to Search Menu")
         
-        # Display menu and get user choice
+        # Display menu and get user choice, asking again if a header is picked
         terminal_menu = TerminalMenu(folder_menu, title="Select a path from database:")
-        menu_index = terminal_menu.show()
-        
-        if menu_index is None or menu_index == len(folder_menu) - 1:
-            print("No path selected. Returning to search menu.")
-            return self.search_path()
-        
-        # Skip category headers and separators when determining the selected folder
-        selected_index = 0
-        real_folders = []
-        
-        for i, item in enumerate(folder_menu):
-            if i == menu_index:
-                # Check if selected item is a header or separator
-                if item.startswith("==") or item.startswith("──────"):
-                    print("Please select a path, not a category header or separator.")
-                    return self.select_path_from_database()
-                
-                selected_index = len(real_folders) - 1
-                break
-            elif not (item.startswith("==") or item.startswith("──────")):
-                real_folders.append(item)
+        while True:
+            menu_index = terminal_menu.show()
+            
+            if menu_index is None or menu_index == len(folder_menu) - 1:
+                print("No path selected. Returning to search menu.")
+                return None
+            
+            # Headers and separators do not refer to a folder
+            if menu_index >= len(folder_index_by_menu) or folder_index_by_menu[menu_index] is None:
+                print("Please select a path, not a category header or separator.")
+                continue
+            selected_index = folder_index_by_menu[menu_index]
+            break
         
         # Get the actual path and category for the selection
         selected_path = folders[selected_index][0]
@@ -676,8 +961,8 @@ class JellyfinManager:
                 "Fields": "Path,Type,Name,RunTimeTicks" # Specify fields to return
             }
             
-            endpoint = f"{self.server_url}/Items"
-            response = requests.get(endpoint, headers=self.headers, params=params)
+            endpoint = self.items_url
+            response = self.session.get(endpoint, params=params, timeout=REQUEST_TIMEOUT)
             
             # Check if request was successful
             if response.status_code == 200:
@@ -695,28 +980,21 @@ class JellyfinManager:
                     option_index = options_menu.show()
                     
                     if option_index == 0:  # Browse items
-                        print("\nID                                     | Name                          | Type")
-                        print("-" * 80)
-                        
-                        for item in items[:10]:  # Show first 10 items
-                            item_id = item.get('Id', 'N/A')
-                            name = item.get('Name', 'N/A')
-                            item_type = item.get('Type', 'N/A')
-                            
-                            print(f"{item_id} | {name[:30]:<30} | {item_type}")
+                        # Show the first 10 items, printed as one block
+                        lines = ["\nID                                     | Name                          | Type", "-" * 80]
+                        lines.extend(
+                            f"{item.get('Id', 'N/A')} | {item.get('Name', 'N/A')[:30]:<30} | {item.get('Type', 'N/A')}"
+                            for item in items[:10]
+                        )
+                        write_lines(lines)
                         
                         if len(items) > 10:
                             print(f"... and {len(items) - 10} more items")
                             
                         # Allow selecting an item to view details
-                        if input("\nView a specific item? (y/n): ").lower() == 'y':
+                        if ask_yes_no("\nView a specific item? (y/n): "):
                             # Create menu of items
-                            item_menu = []
-                            for item in items:
-                                name = item.get('Name', 'N/A')
-                                item_type = item.get('Type', 'N/A')
-                                item_menu.append(f"[{item_type}] {name}")
-                            
+                            item_menu = [f"[{item.get('Type', 'N/A')}] {item.get('Name', 'N/A')}" for item in items]
                             item_menu.append("Back")
                             
                             item_selector = TerminalMenu(item_menu, title="Select an item to view:")
@@ -730,21 +1008,12 @@ class JellyfinManager:
                         print(f"Path '{selected_path}' is already in the database under category '{selected_category}'.")
                         
                         # Offer to change category
-                        if input("Would you like to change the category? (y/n): ").lower() == 'y':
-                            conn = sqlite3.connect(self.db_file)
-                            cursor = conn.cursor()
-                            
+                        if ask_yes_no("Would you like to change the category? (y/n): "):
                             # Get all categories
-                            cursor.execute('SELECT id, name FROM categories ORDER BY name')
-                            categories = cursor.fetchall()
+                            categories = self.get_categories()[0]
                             
-                            # Create menu of category options
-                            category_menu = []
-                            for id, name in categories:
-                                category_menu.append(f"ID{id} {name}")
-                                
                             # Display menu and get user choice
-                            terminal_menu = TerminalMenu(category_menu, title="Select a new category for this path:")
+                            terminal_menu = self.get_category_selector("Select a new category for this path:")
                             category_index = terminal_menu.show()
                             
                             if category_index is not None:
@@ -754,16 +1023,14 @@ class JellyfinManager:
                                 
                                 # Update in database
                                 try:
-                                    cursor.execute(
-                                        'UPDATE folders SET category_id = ? WHERE path = ?',
-                                        (selected_category_id, selected_path)
-                                    )
-                                    conn.commit()
+                                    with conn:
+                                        cursor.execute(
+                                            'UPDATE folders SET category_id = ? WHERE path = ?',
+                                            (selected_category_id, selected_path)
+                                        )
                                     print(f"Path '{selected_path}' updated to category '{selected_category_name}'.")
                                 except sqlite3.Error as e:
                                     print(f"Database error: {e}")
-                            
-                            conn.close()
             else:
                 print(f"Error retrieving items from Jellyfin. Status code: {response.status_code}")
                 print(f"Response: {response.text}")
@@ -778,263 +1045,298 @@ class JellyfinManager:
         input("\nPress Enter to Continue")
         return True
     
+    def child_params(self, item_id):
+        """Return the query parameters for the direct children of an item."""
+        return dict(CHILD_QUERY, ParentId=item_id)
+    
+    def fetch_child_preview(self, item_id):
+        """Request the first page of an item's children from the Jellyfin API."""
+        params = dict(self.child_params(item_id), StartIndex=0, Limit=25)
+        return self.session.get(self.items_url, params=params, timeout=REQUEST_TIMEOUT)
+    
     def process_selected_item(self, item):
         """Process a selected item from Jellyfin search results."""
-        item_id = item.get('Id', 'N/A')
-        item_name = item.get('Name', 'Unnamed')
-        item_path = item.get('Path', '')
-        item_type = item.get('Type', 'Unknown')
-        
-        print(f"\nSelected Item: {item_name}")
-        print(f"Type: {item_type}")
-        print(f"Path: {item_path}")
-        print(f"ID: {item_id}")
-        
-        # For folders and albums, fetch child items
-        if item_type in ["Folder", "MusicAlbum"]:
-            try:
-                # Make the API request to get child items
-                params = {
-                    "ParentId": item_id,
-                    "Recursive": "false",
-                    "Fields": "Path,Name,Type,RunTimeTicks",
-                    "SortBy": "Name",
-                    "SortOrder": "Ascending"
-                }
-                
-                endpoint = f"{self.server_url}/Items"
-                response = requests.get(endpoint, headers=self.headers, params=params)
-                
-                # Check if request was successful
-                if response.status_code == 200:
-                    result = response.json()
-                    children = result.get("Items", [])
+        dir_entries.cache_clear()
+        # Drilling into a child replaces the current item rather than recursing
+        while True:
+            item_id = item.get('Id', 'N/A')
+            item_name = item.get('Name', 'Unnamed')
+            item_path = item.get('Path', '')
+            item_type = item.get('Type', 'Unknown')
+            
+            # For folders and albums, start fetching the children before printing
+            # anything, reusing a prefetch made while the parent was listed
+            if item_type in ["Folder", "MusicAlbum"]:
+                preview_future = self.child_prefetch.pop(item_id, None)
+                if preview_future is None:
+                    preview_future = self.pool.submit(self.fetch_child_preview, item_id)
+            # Prefetches for the other items at the previous level are not needed
+            self.child_prefetch.clear()
+            
+            write_lines([f"\nSelected Item: {item_name}", f"Type: {item_type}",
+                         f"Path: {item_path}", f"ID: {item_id}"])
+            
+            # For folders and albums, fetch child items
+            if item_type in ["Folder", "MusicAlbum"]:
+                try:
+                    # Only the preview page has been requested; the rest are
+                    # fetched if the user asks to see or select them
+                    params = self.child_params(item_id)
+                    response = preview_future.result()
                     
-                    if not children:
-                        print("No child items found.")
-                    else:
-                        print(f"\nFound {len(children)} child items:")
+                    # Check if request was successful
+                    if response.status_code == 200:
+                        result = response.json()
+                        children = result.get("Items", [])
+                        total_children = result.get("TotalRecordCount", len(children))
                         
-                        # Offer option to view children or add path to database
-                        options = ["View child items", "Add this path to database", "Back"]
-                        options_menu = TerminalMenu(options, title="What would you like to do?")
-                        option_index = options_menu.show()
-                        
-                        if option_index == 0:  # View child items
-                            print("\nName                          | Type       | Duration")
-                            print("-" * 70)
+                        if not children:
+                            print("No child items found.")
+                        else:
+                            print(f"\nFound {total_children} child items:")
                             
-                            for child in children[:10]:  # Show first 10 children
-                                child_name = child.get('Name', 'N/A')
-                                child_type = child.get('Type', 'N/A')
-                                
-                                # Format duration if available
-                                duration = child.get('RunTimeTicks', 0)
-                                if duration:
-                                    # Convert ticks (100-nanosecond units) to seconds
-                                    duration_seconds = duration / 10000000
-                                    minutes = int(duration_seconds // 60)
-                                    seconds = int(duration_seconds % 60)
-                                    duration_str = f"{minutes}:{seconds:02d}"
-                                else:
-                                    duration_str = "N/A"
-                                
-                                print(f"{child_name[:30]:<30} | {child_type:<10} | {duration_str}")
+                            # Offer option to view children or add path to database
+                            options = ["View child items", "Add this path to database", "Back"]
+                            options_menu = TerminalMenu(options, title="What would you like to do?")
+                            option_index = options_menu.show()
                             
-                            if len(children) > 10:
-                                print(f"... and {len(children) - 10} more items")
-                                
-                            # Offer to view all items or select an item
-                            view_all = input("\nView all items? (y/n): ")
-                            if view_all.lower() == 'y':
-                                print("\nAll items:")
-                                print("\nName                          | Type       | Duration")
-                                print("-" * 70)
+                            if option_index == 0:  # View child items
+                                # Format each child once; the rows are reused if
+                                # the user asks to view every item
+                                child_rows = [format_child_row(child) for child in children]
+                                write_lines([CHILD_TABLE_HEADER] + child_rows[:10])  # Show first 10 children
                                 
+                                # Fetch the children of the listed folders and albums
+                                # while the user decides what to do next
                                 for child in children:
-                                    child_name = child.get('Name', 'N/A')
-                                    child_type = child.get('Type', 'N/A')
+                                    if child.get('Type') in ["Folder", "MusicAlbum"] and 'Id' in child:
+                                        self.child_prefetch[child['Id']] = self.pool.submit(
+                                            self.fetch_child_preview, child['Id'])
+                                
+                                if total_children > 10:
+                                    print(f"... and {total_children - 10} more items")
                                     
-                                    # Format duration if available
-                                    duration = child.get('RunTimeTicks', 0)
-                                    if duration:
-                                        # Convert ticks (100-nanosecond units) to seconds
-                                        duration_seconds = duration / 10000000
-                                        minutes = int(duration_seconds // 60)
-                                        seconds = int(duration_seconds % 60)
-                                        duration_str = f"{minutes}:{seconds:02d}"
-                                    else:
-                                        duration_str = "N/A"
+                                # Offer to view all items or select an item
+                                view_all = ask_yes_no("\nView all items? (y/n): ")
+                                if view_all:
+                                    if len(children) < total_children:
+                                        children = [child for page in self.paged_items(params) for child in page]
+                                        child_rows.extend(format_child_row(child) for child in children[len(child_rows):])
                                     
-                                    print(f"{child_name[:30]:<30} | {child_type:<10} | {duration_str}")
-                            
-                            # Offer to select a child item
-                            select_child = input("\nSelect a child item? (y/n): ")
-                            if select_child.lower() == 'y':
-                                # Create menu of child items
-                                child_menu = []
-                                for child in children:
-                                    child_name = child.get('Name', 'N/A')
-                                    child_type = child.get('Type', 'N/A')
-                                    child_menu.append(f"[{child_type}] {child_name}")
-                                
-                                child_menu.append("Back")
-                                
-                                child_selector = TerminalMenu(child_menu, title="Select a child item:")
-                                child_index = child_selector.show()
+                                    print("\nAll items:")
+                                    write_lines([CHILD_TABLE_HEADER] + child_rows)
                                 
-                                if child_index is not None and child_index < len(children):
-                                    self.process_selected_item(children[child_index])
-                        
-                        elif option_index == 1:  # Add path to database
-                            # Continue to path processing below
-                            pass
-                        else:
-                            # Skip path processing
-                            input("\nPress Enter to Continue")
-                            return True
-                else:
-                    print(f"Error retrieving child items. Status code: {response.status_code}")
-            
-            except requests.exceptions.RequestException as e:
-                print(f"Error connecting to Jellyfin server: {e}")
-            except ValueError as e:
-                print(f"Error parsing response: {e}")
-            except Exception as e:
-                print(f"An unexpected error occurred: {e}")
-        
-        # If path exists, offer to add it to the database
-        if item_path and os.path.exists(item_path):
-            print("\nThis path exists on the filesystem.")
-            
-            # Check if path is already in the database
-            conn = sqlite3.connect(self.db_file)
-            cursor = conn.cursor()
-            cursor.execute('SELECT category_id FROM folders WHERE path = ?', (item_path,))
-            existing = cursor.fetchone()
+                                # Offer to select a child item
+                                select_child = ask_yes_no("\nSelect a child item? (y/n): ")
+                                if select_child:
+                                    if len(children) < total_children:
+                                        children = [child for page in self.paged_items(params) for child in page]
+                                    
+                                    # Create menu of child items
+                                    child_menu = [f"[{child.get('Type', 'N/A')}] {child.get('Name', 'N/A')}"
+                                                  for child in children]
+                                    child_menu.append("Back")
+                                    
+                                    child_selector = TerminalMenu(child_menu, title="Select a child item:")
+                                    child_index = child_selector.show()
+                                    
+                                    if child_index is not None and child_index < len(children):
+                                        item = children[child_index]
+                                        continue
+                            
+                            elif option_index == 1:  # Add path to database
+                                # Continue to path processing below
+                                pass
+                            else:
+                                # Skip path processing
+                                input("\nPress Enter to Continue")
+                                return True
+                    else:
+                        print(f"Error retrieving child items. Status code: {response.status_code}")
+                
+                except requests.exceptions.RequestException as e:
+                    print(f"Error connecting to Jellyfin server: {e}")
+                except ValueError as e:
+                    print(f"Error parsing response: {e}")
+                except Exception as e:
+                    print(f"An unexpected error occurred: {e}")
             
-            if existing:
-                # Get category name
-                cursor.execute('SELECT name FROM categories WHERE id = ?', (existing[0],))
-                category_name = cursor.fetchone()[0]
-                print(f"This path is already in the database under category: {category_name}")
+            # If path exists, offer to add it to the database
+            if item_path and path_exists(item_path):
+                print("\nThis path exists on the filesystem.")
                 
-                # Offer to change category
-                change_category = input("Would you like to change the category? (y/n): ")
-                if change_category.lower() == 'y':
-                    # Get all categories
-                    cursor.execute('SELECT id, name FROM categories ORDER BY name')
-                    categories = cursor.fetchall()
-                    
-                    if not categories:
-                        print("No categories found. Please create categories first.")
-                        conn.close()
-                        return True
-                    
-                    # Create menu of category options
-                    category_menu = []
-                    for id, name in categories:
-                        category_menu.append(f"ID{id} {name}")
-                        
-                    # Display menu and get user choice
-                    terminal_menu = TerminalMenu(category_menu, title="Select a new category for this path:")
-                    category_index = terminal_menu.show()
+                # Check if path is already in the database
+                conn = self.get_connection()
+                cursor = conn.cursor()
+                category_name = self.get_folder_category(cursor, item_path)
+                
+                if category_name:
+                    print(f"This path is already in the database under category: {category_name}")
                     
-                    if category_index is not None:
-                        # Get the selected category
-                        selected_category_id = categories[category_index][0]
-                        selected_category_name = categories[category_index][1]
+                    # Offer to change category
+                    change_category = ask_yes_no("Would you like to change the category? (y/n): ")
+                    if change_category:
+                        # Get all categories
+                        categories = self.get_categories()[0]
                         
-                        # Update in database
-                        try:
-                            cursor.execute(
-                                'UPDATE folders SET category_id = ? WHERE path = ?',
-                                (selected_category_id, item_path)
-                            )
-                            conn.commit()
-                            print(f"Path '{item_path}' updated to category '{selected_category_name}'.")
-                        except sqlite3.Error as e:
-                            print(f"Database error: {e}")
-            else:
-                # Offer to add to database
-                add_to_db = input("Would you like to add this path to the database? (y/n): ")
-                if add_to_db.lower() == 'y':
-                    # Get all categories
-                    cursor.execute('SELECT id, name FROM categories ORDER BY name')
-                    categories = cursor.fetchall()
-                    
-                    if not categories:
-                        print("No categories found. Please create categories first.")
-                        conn.close()
-                        return True
-                    
-                    # Create menu of category options
-                    category_menu = []
-                    for id, name in categories:
-                        category_menu.append(f"ID{id} {name}")
+                        if not categories:
+                            print("No categories found. Please create categories first.")
+                            return True
                         
-                    # Display menu and get user choice
-                    terminal_menu = TerminalMenu(category_menu, title="Select a category for this path:")
-                    category_index = terminal_menu.show()
-                    
-                    if category_index is not None:
-                        # Get the selected category
-                        selected_category_id = categories[category_index][0]
-                        selected_category_name = categories[category_index][1]
+                        # Display menu and get user choice
+                        terminal_menu = self.get_category_selector("Select a new category for this path:")
+                        category_index = terminal_menu.show()
                         
-                        # Store in database
-                        try:
-                            # Add username if known
-                            if hasattr(self, 'selected_user_name'):
-                                cursor.execute(
-                                    'INSERT OR REPLACE INTO folders (path, category_id, user_name) VALUES (?, ?, ?)',
-                                    (item_path, selected_category_id, self.selected_user_name)
-                                )
-                            else:
-                                cursor.execute(
-                                    'INSERT OR REPLACE INTO folders (path, category_id) VALUES (?, ?)',
-                                    (item_path, selected_category_id)
-                                )
-                            conn.commit()
-                            print(f"Path '{item_path}' added to database under category '{selected_category_name}'.")
-                        except sqlite3.Error as e:
-                            print(f"Database error: {e}")
-                    else:
-                        print("No category selected. Path not added to database.")
+                        if category_index is not None:
+                            # Get the selected category
+                            selected_category_id = categories[category_index][0]
+                            selected_category_name = categories[category_index][1]
+                            
+                            # Update in database
+                            try:
+                                with conn:
+                                    cursor.execute(
+                                        'UPDATE folders SET category_id = ? WHERE path = ?',
+                                        (selected_category_id, item_path)
+                                    )
+                                print(f"Path '{item_path}' updated to category '{selected_category_name}'.")
+                            except sqlite3.Error as e:
+                                print(f"Database error: {e}")
+                else:
+                    # Offer to add to database
+                    add_to_db = ask_yes_no("Would you like to add this path to the database? (y/n): ")
+                    if add_to_db:
+                        self.add_folder_to_category(item_path, "Select a category for this path:")
+            else:
+                print("This path does not exist on the filesystem or is empty.")
             
-            conn.close()
+            input("\nPress Enter to Continue")
+            return True
+    
+    def get_categories(self):
+        """Return the (id, name) rows of all categories sorted by name, and their menu entries."""
+        cursor = self.get_connection().cursor()
+        # data_version changes whenever another connection, such as the one
+        # PlaylistManager uses to create and delete categories, commits
+        cursor.execute('PRAGMA data_version')
+        version = cursor.fetchone()[0]
+        
+        if self.categories is None or version != self.categories_version:
+            cursor.execute('SELECT id, name FROM categories ORDER BY name')
+            self.categories = cursor.fetchall()
+            self.category_menu = [f"ID{id} {name}" for id, name in self.categories]
+            self.categories_version = version
+            self.category_selectors = {}
+        return self.categories, self.category_menu
+    
+    def get_category_selector(self, title):
+        """Return a menu of the categories with the given title, reused while the categories are unchanged."""
+        category_menu = self.get_categories()[1]
+        if title not in self.category_selectors:
+            self.category_selectors[title] = TerminalMenu(category_menu, title=title)
+        return self.category_selectors[title]
+    
+    def get_folder_category(self, cursor, path):
+        """Return the name of the category a folder path is stored under, or None."""
+        cursor.execute('''
+            SELECT c.name FROM folders f
+            JOIN categories c ON c.id = f.category_id
+            WHERE f.path = ?
+        ''', (path,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+    
+    def prefetch_dir_entries(self, directories):
+        """Read the given directories on the worker pool so later path_exists calls hit the cache."""
+        # A new listing starts from fresh directory contents
+        dir_entries.cache_clear()
+        for directory in set(directories):
+            self.pool.submit(dir_entries, directory)
+    
+    def get_folder_categories(self, cursor, paths):
+        """Return a dict mapping each of the given paths stored as a folder to its category name."""
+        paths = list(set(paths))
+        categories = {}
+        # Query in batches to stay under SQLite's limit on bound parameters
+        for start in range(0, len(paths), 500):
+            batch = paths[start:start + 500]
+            placeholders = ','.join('?' * len(batch))
+            cursor.execute(f'''
+                SELECT f.path, c.name FROM folders f
+                JOIN categories c ON c.id = f.category_id
+                WHERE f.path IN ({placeholders})
+            ''', batch)
+            categories.update(cursor.fetchall())
+        return categories
+    
+    def offer_to_add_item_folder(self, item_path, folder_categories=None):
+        """Offer to add the folder containing an item to the database if it has no category yet.
+        
+        folder_categories maps folder paths to category names for callers that
+        have already looked up a whole page of items; otherwise the folder is
+        looked up on its own.
+        """
+        if not path_exists(item_path):
+            return
+        print("This path exists on the filesystem.")
+        
+        folder_path = os.path.dirname(item_path)
+        if folder_categories is None:
+            category_name = self.get_folder_category(self.get_connection().cursor(), folder_path)
         else:
-            print("This path does not exist on the filesystem or is empty.")
+            category_name = folder_categories.get(folder_path)
         
-        input("\nPress Enter to Continue")
-        return True
+        if category_name:
+            print(f"The folder containing this item is already in the database under category: {category_name}")
+        elif ask_yes_no("\nWould you like to add this item's folder to the database? (y/n): "):
+            self.add_folder_to_category(folder_path, "Select a category for this folder:")
+    
+    def add_folder_to_category(self, path, title):
+        """Prompt for a category and store the path under it in the folders table."""
+        categories = self.get_categories()[0]
+        
+        if not categories:
+            print("No categories found. Please create categories first.")
+            return
+        
+        category_index = self.get_category_selector(title).show()
+        if category_index is None:
+            print("No category selected. Path not added to database.")
+            return
+        
+        category_id, category_name = categories[category_index]
+        try:
+            conn = self.get_connection()
+            with conn:
+                conn.execute(INSERT_FOLDER_SQL,
+                             (path, category_id, self.selected_user_name))
+            print(f"Path '{path}' added to database under category '{category_name}'.")
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
     
     def browse_database(self):
         """Browse Jellyfin items stored in the local database."""
-        conn = sqlite3.connect(self.db_file)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
-        # Check if we have items in the database
-        cursor.execute('SELECT COUNT(*) FROM jellyfin_items')
-        item_count = cursor.fetchone()[0]
+        # Count the items of each type; their sum is the total, so the table
+        # only needs to be read once
+        cursor.execute('SELECT type, COUNT(*) FROM jellyfin_items GROUP BY type ORDER BY COUNT(*) DESC')
+        type_counts = cursor.fetchall()
+        item_count = sum(count for _, count in type_counts)
         
+        # Check if we have items in the database
         if item_count == 0:
             print("\n---------No Jellyfin Items in Database---------")
             print("You need to scan Jellyfin items first.")
             print("Choose 'Scan Jellyfin Items' from the main menu.")
             input("Press Enter to Continue")
-            conn.close()
             return False
         
         print(f"\n---------Browse Jellyfin Items ({item_count} items in database)---------")
         
-        # Get some stats on item types
-        cursor.execute('SELECT type, COUNT(*) FROM jellyfin_items GROUP BY type ORDER BY COUNT(*) DESC')
-        type_counts = cursor.fetchall()
-        
-        print("Item types in database:")
-        for item_type, count in type_counts:
-            print(f"  {item_type}: {count} items")
+        write_lines(["Item types in database:"] +
+                    [f"  {item_type}: {count} items" for item_type, count in type_counts])
         
         # Options for browsing
         browse_options = [
@@ -1044,8 +1346,9 @@ class JellyfinManager:
             "Back to Main Menu"
         ]
         
+        # The options never change, so one menu is shown on every pass
+        browse_menu = TerminalMenu(browse_options, title="\nSelect a browse method:")
         while True:
-            browse_menu = TerminalMenu(browse_options, title="\nSelect a browse method:")
             browse_index = browse_menu.show()
             
             if browse_index == 0:  # Browse by folder structure
@@ -1057,54 +1360,48 @@ class JellyfinManager:
             else:  # Back to Main Menu or None
                 break
         
-        conn.close()
         return True
     
     def browse_by_folder_structure(self, conn):
         """Browse Jellyfin items by folder structure."""
+        dir_entries.cache_clear()
         cursor = conn.cursor()
         
-        # Check if albumartist column exists
-        cursor.execute("PRAGMA table_info(jellyfin_items)")
-        columns = [column[1] for column in cursor.fetchall()]
-        
-        if 'albumartist' in columns:
-            # Include albumartist in query
-            query = '''
-                SELECT item_id, title, type, path, albumartist
-                FROM jellyfin_items 
-                WHERE parent_id IS NULL OR parent_id = '' 
-                ORDER BY title
-            '''
-        else:
-            # Original query without albumartist
-            query = '''
-                SELECT item_id, title, type, path 
-                FROM jellyfin_items 
-                WHERE parent_id IS NULL OR parent_id = '' 
-                ORDER BY title
-            '''
-        
-        cursor.execute(query)
+        # Whether the albumartist column exists, checked once at startup
+        has_albumartist = self.has_albumartist
+        
+        # Every level is read with the same columns, adding albumartist when
+        # the column exists
+        columns = "item_id, title, type, path, albumartist" if has_albumartist else "item_id, title, type, path"
+        root_query = f'''
+            SELECT {columns}
+            FROM jellyfin_items 
+            WHERE parent_id IS NULL OR parent_id = '' 
+            ORDER BY title
+        '''
+        children_query = f'''
+            SELECT {columns}
+            FROM jellyfin_items 
+            WHERE parent_id = ? 
+            ORDER BY title
+        '''
+        
+        cursor.execute(root_query)
         
         items = cursor.fetchall()
         current_items = items
+        has_children = self.items_with_children(cursor, current_items)
         current_path = []  # Stack to track navigation path
         
         while True:
-            # Build the menu items
-            item_menu = []
-            for item in current_items:
-                item_id = item[0]
-                title = item[1]
-                item_type = item[2]
-                
-                # Check if albumartist exists and is available in this item
-                if 'albumartist' in columns and len(item) > 4 and item[4]:
-                    albumartist = item[4]
-                    item_menu.append(f"[{item_type}] {title} - {albumartist}")
-                else:
-                    item_menu.append(f"[{item_type}] {title}")
+            # Build the menu items, adding the album artist when known
+            if has_albumartist:
+                item_menu = [
+                    f"[{item_type}] {title} - {albumartist}" if albumartist else f"[{item_type}] {title}"
+                    for _, title, item_type, _, albumartist in current_items
+                ]
+            else:
+                item_menu = [f"[{item[2]}] {item[1]}" for item in current_items]
             
             # Add navigation options
             if current_path:  # If we're not at the root
@@ -1132,21 +1429,12 @@ class JellyfinManager:
                 
                 if current_path:  # If we still have path items, go to the previous level
                     grandparent_id = current_path[-1][0]
-                    cursor.execute('''
-                        SELECT item_id, title, type, path 
-                        FROM jellyfin_items 
-                        WHERE parent_id = ? 
-                        ORDER BY title
-                    ''', (grandparent_id,))
+                    cursor.execute(children_query, (grandparent_id,))
                 else:  # We're going back to the root
-                    cursor.execute('''
-                        SELECT item_id, title, type, path 
-                        FROM jellyfin_items 
-                        WHERE parent_id IS NULL OR parent_id = '' 
-                        ORDER BY title
-                    ''')
+                    cursor.execute(root_query)
                 
                 current_items = cursor.fetchall()
+                has_children = self.items_with_children(cursor, current_items)
                 continue
             
             elif menu_index == len(current_items) + (1 if current_path else 0):  # Back to Browse Menu
@@ -1158,33 +1446,18 @@ class JellyfinManager:
             selected_title = selected_item[1]
             selected_type = selected_item[2]
             selected_path = selected_item[3]
-            selected_albumartist = selected_item[4] if 'albumartist' in columns and len(selected_item) > 4 else None
+            selected_albumartist = selected_item[4] if has_albumartist else None
             
             # Check if this item has children
-            cursor.execute('SELECT COUNT(*) FROM jellyfin_items WHERE parent_id = ?', (selected_id,))
-            child_count = cursor.fetchone()[0]
-            
-            if child_count > 0:  # This is a folder or container with children
+            if selected_id in has_children:  # This is a folder or container with children
                 # Add this item to the path stack
                 current_path.append((selected_id, selected_title))
                 
                 # Get its children
-                if 'albumartist' in columns:
-                    cursor.execute('''
-                        SELECT item_id, title, type, path, albumartist
-                        FROM jellyfin_items 
-                        WHERE parent_id = ? 
-                        ORDER BY title
-                    ''', (selected_id,))
-                else:
-                    cursor.execute('''
-                        SELECT item_id, title, type, path 
-                        FROM jellyfin_items 
-                        WHERE parent_id = ? 
-                        ORDER BY title
-                    ''', (selected_id,))
+                cursor.execute(children_query, (selected_id,))
                 
                 current_items = cursor.fetchall()
+                has_children = self.items_with_children(cursor, current_items)
             else:  # This is a leaf item (like an audio file)
                 # Display item details
                 print(f"\nItem: {selected_title}")
@@ -1196,67 +1469,25 @@ class JellyfinManager:
                 if selected_path:
                     print(f"Path: {selected_path}")
                     
-                    # Check if this path exists on the filesystem
-                    if os.path.exists(selected_path):
-                        print("This path exists on the filesystem.")
-                        
-                        # Check if the path is already in our folders database
-                        cursor.execute('SELECT category_id FROM folders WHERE path = ?', (os.path.dirname(selected_path),))
-                        folder_category = cursor.fetchone()
-                        
-                        if folder_category:
-                            cursor.execute('SELECT name FROM categories WHERE id = ?', (folder_category[0],))
-                            category_name = cursor.fetchone()[0]
-                            print(f"The folder containing this item is already in the database under category: {category_name}")
-                        else:
-                            # Offer to add the folder to the database
-                            add_to_db = input("\nWould you like to add this item's folder to the database? (y/n): ")
-                            if add_to_db.lower() == 'y':
-                                folder_path = os.path.dirname(selected_path)
-                                
-                                # Get all categories
-                                cursor.execute('SELECT id, name FROM categories ORDER BY name')
-                                categories = cursor.fetchall()
-                                
-                                if not categories:
-                                    print("No categories found. Please create categories first.")
-                                    input("Press Enter to Continue")
-                                    continue
-                                
-                                # Create menu of category options
-                                category_menu = []
-                                for id, name in categories:
-                                    category_menu.append(f"ID{id} {name}")
-                                    
-                                # Display menu and get user choice
-                                category_selector = TerminalMenu(category_menu, title="Select a category for this folder:")
-                                category_index = category_selector.show()
-                                
-                                if category_index is not None:
-                                    # Get the selected category
-                                    selected_category_id = categories[category_index][0]
-                                    selected_category_name = categories[category_index][1]
-                                    
-                                    # Store in database
-                                    try:
-                                        # Add username if known
-                                        if hasattr(self, 'selected_user_name'):
-                                            cursor.execute(
-                                                'INSERT OR REPLACE INTO folders (path, category_id, user_name) VALUES (?, ?, ?)',
-                                                (folder_path, selected_category_id, self.selected_user_name)
-                                            )
-                                        else:
-                                            cursor.execute(
-                                                'INSERT OR REPLACE INTO folders (path, category_id) VALUES (?, ?)',
-                                                (folder_path, selected_category_id)
-                                            )
-                                        conn.commit()
-                                        print(f"Folder '{folder_path}' added to database under category '{selected_category_name}'.")
-                                    except sqlite3.Error as e:
-                                        print(f"Database error: {e}")
+                    self.offer_to_add_item_folder(selected_path)
                     
                 input("\nPress Enter to Continue")
     
+    def items_with_children(self, cursor, items):
+        """Return the IDs of the given items that are the parent of another item."""
+        item_ids = [item[0] for item in items]
+        parent_ids = set()
+        # Query in batches to stay under SQLite's limit on bound parameters
+        for start in range(0, len(item_ids), 500):
+            batch = item_ids[start:start + 500]
+            placeholders = ','.join('?' * len(batch))
+            cursor.execute(
+                f'SELECT DISTINCT parent_id FROM jellyfin_items WHERE parent_id IN ({placeholders})',
+                batch
+            )
+            parent_ids.update(row[0] for row in cursor.fetchall())
+        return parent_ids
+    
     def search_by_title(self, conn):
         """Search Jellyfin items by title."""
         cursor = conn.cursor()
@@ -1266,17 +1497,16 @@ class JellyfinManager:
         if not search_term:
             return
         
-        # Check if albumartist column exists
-        cursor.execute("PRAGMA table_info(jellyfin_items)")
-        columns = [column[1] for column in cursor.fetchall()]
+        # Whether the albumartist column exists, checked once at startup
+        has_albumartist = self.has_albumartist
         
         # Search the database
-        if 'albumartist' in columns:
+        if has_albumartist:
             cursor.execute('''
                 SELECT item_id, title, type, path, albumartist
                 FROM jellyfin_items 
                 WHERE title LIKE ? 
-                ORDER BY title
+                ORDER BY title COLLATE NOCASE
                 LIMIT 100
             ''', (f'%{search_term}%',))
         else:
@@ -1284,7 +1514,7 @@ class JellyfinManager:
                 SELECT item_id, title, type, path 
                 FROM jellyfin_items 
                 WHERE title LIKE ? 
-                ORDER BY title
+                ORDER BY title COLLATE NOCASE
                 LIMIT 100
             ''', (f'%{search_term}%',))
         
@@ -1297,20 +1527,20 @@ class JellyfinManager:
         
         print(f"\nFound {len(items)} items matching '{search_term}':")
         
-        # Create menu of search results
-        item_menu = []
-        for item in items:
-            item_id = item[0]
-            title = item[1]
-            item_type = item[2]
-            
-            # Check if albumartist exists in this item
-            if 'albumartist' in columns and len(item) > 4 and item[4]:
-                albumartist = item[4]
-                item_menu.append(f"[{item_type}] {title} - {albumartist}")
-            else:
-                item_menu.append(f"[{item_type}] {title}")
-        
+        # Look up the categories of the listed items' folders up front, and
+        # read their directories in the background for the existence check
+        folders = [os.path.dirname(item[3]) for item in items if item[3]]
+        folder_categories = self.get_folder_categories(cursor, folders)
+        self.prefetch_dir_entries(folders)
+        
+        # Create menu of search results, adding the album artist when known
+        if has_albumartist:
+            item_menu = [
+                f"[{item_type}] {title} - {albumartist}" if albumartist else f"[{item_type}] {title}"
+                for _, title, item_type, _, albumartist in items
+            ]
+        else:
+            item_menu = [f"[{item[2]}] {item[1]}" for item in items]
         item_menu.append("Back to Browse Menu")
         
         # Show the menu
@@ -1327,227 +1557,128 @@ class JellyfinManager:
         print(f"ID: {selected_item[0]}")
         
         # Display album artist if available
-        if 'albumartist' in columns and len(selected_item) > 4 and selected_item[4]:
+        if has_albumartist and len(selected_item) > 4 and selected_item[4]:
             print(f"Album Artist: {selected_item[4]}")
         
         if selected_item[3]:  # If path exists
             print(f"Path: {selected_item[3]}")
             
-            # Check if this path exists on the filesystem
-            if os.path.exists(selected_item[3]):
-                print("This path exists on the filesystem.")
-                
-                # Check if the path is already in our folders database
-                cursor.execute('SELECT category_id FROM folders WHERE path = ?', (os.path.dirname(selected_item[3]),))
-                folder_category = cursor.fetchone()
-                
-                if folder_category:
-                    cursor.execute('SELECT name FROM categories WHERE id = ?', (folder_category[0],))
-                    category_name = cursor.fetchone()[0]
-                    print(f"The folder containing this item is already in the database under category: {category_name}")
-                else:
-                    # Offer to add the folder to the database
-                    add_to_db = input("\nWould you like to add this item's folder to the database? (y/n): ")
-                    if add_to_db.lower() == 'y':
-                        folder_path = os.path.dirname(selected_item[3])
-                        
-                        # Get all categories
-                        cursor.execute('SELECT id, name FROM categories ORDER BY name')
-                        categories = cursor.fetchall()
-                        
-                        if not categories:
-                            print("No categories found. Please create categories first.")
-                            input("Press Enter to Continue")
-                            return
-                        
-                        # Create menu of category options
-                        category_menu = []
-                        for id, name in categories:
-                            category_menu.append(f"ID{id} {name}")
-                            
-                        # Display menu and get user choice
-                        category_selector = TerminalMenu(category_menu, title="Select a category for this folder:")
-                        category_index = category_selector.show()
-                        
-                        if category_index is not None:
-                            # Get the selected category
-                            selected_category_id = categories[category_index][0]
-                            selected_category_name = categories[category_index][1]
-                            
-                            # Store in database
-                            try:
-                                # Add username if known
-                                if hasattr(self, 'selected_user_name'):
-                                    cursor.execute(
-                                        'INSERT OR REPLACE INTO folders (path, category_id, user_name) VALUES (?, ?, ?)',
-                                        (folder_path, selected_category_id, self.selected_user_name)
-                                    )
-                                else:
-                                    cursor.execute(
-                                        'INSERT OR REPLACE INTO folders (path, category_id) VALUES (?, ?)',
-                                        (folder_path, selected_category_id)
-                                    )
-                                conn.commit()
-                                print(f"Folder '{folder_path}' added to database under category '{selected_category_name}'.")
-                            except sqlite3.Error as e:
-                                print(f"Database error: {e}")
+            self.offer_to_add_item_folder(selected_item[3], folder_categories)
         
         input("\nPress Enter to Continue")
     
     def filter_by_type(self, conn):
         """Filter Jellyfin items by type."""
         cursor = conn.cursor()
+        # Name the columns, since albumartist is only selected when it exists
+        cursor.row_factory = sqlite3.Row
         
-        # Check if albumartist column exists
-        cursor.execute("PRAGMA table_info(jellyfin_items)")
-        columns = [column[1] for column in cursor.fetchall()]
-        
-        # Get all available types
-        cursor.execute('SELECT DISTINCT type FROM jellyfin_items ORDER BY type')
-        types = [t[0] for t in cursor.fetchall()]
-        
-        # Create menu of types
-        type_menu = []
-        for item_type in types:
-            # Get count for this type
-            cursor.execute('SELECT COUNT(*) FROM jellyfin_items WHERE type = ?', (item_type,))
-            count = cursor.fetchone()[0]
-            type_menu.append(f"{item_type} ({count} items)")
-        
-        type_menu.append("Back to Browse Menu")
-        
-        # Show the menu
-        terminal_menu = TerminalMenu(type_menu, title="Select an item type to browse:")
-        menu_index = terminal_menu.show()
-        
-        if menu_index is None or menu_index == len(types):
-            return
-        
-        selected_type = types[menu_index]
-        
-        # Get items of the selected type
-        if 'albumartist' in columns:
-            cursor.execute('''
-                SELECT item_id, title, path, albumartist
-                FROM jellyfin_items 
-                WHERE type = ? 
-                ORDER BY title
-                LIMIT 100
-            ''', (selected_type,))
-        else:
-            cursor.execute('''
-                SELECT item_id, title, path 
-                FROM jellyfin_items 
-                WHERE type = ? 
-                ORDER BY title
-                LIMIT 100
-            ''', (selected_type,))
-        
-        items = cursor.fetchall()
-        
-        if not items:
-            print(f"No items found of type '{selected_type}'.")
-            input("Press Enter to Continue")
-            return
-        
-        print(f"\nFound {len(items)} items of type '{selected_type}':")
+        # Whether the albumartist column exists, checked once at startup
+        has_albumartist = self.has_albumartist
         
-        # Create menu of items
-        item_menu = []
-        for item in items:
-            item_id = item[0]
-            title = item[1]
+        while True:
+            # Get all available types with their counts, kept until the next scan
+            if self.type_menu is None:
+                cursor.execute('SELECT type, COUNT(*) FROM jellyfin_items GROUP BY type ORDER BY type')
+                types = []
+                type_menu = []
+                for item_type, count in cursor:
+                    types.append(item_type)
+                    type_menu.append(f"{item_type} ({count} items)")
+                
+                type_menu.append("Back to Browse Menu")
+                self.type_menu = (types, TerminalMenu(type_menu, title="Select an item type to browse:"))
+            types, terminal_menu = self.type_menu
             
-            # Check if albumartist exists in this item
-            if 'albumartist' in columns and len(item) > 3 and item[3]:
-                albumartist = item[3]
-                item_menu.append(f"{title} - {albumartist}")
-            else:
-                item_menu.append(f"{title}")
-        
-        item_menu.append("Back to Type Selection")
-        
-        # Show the menu
-        terminal_menu = TerminalMenu(item_menu, title=f"Items of type '{selected_type}':")
-        menu_index = terminal_menu.show()
-        
-        if menu_index is None or menu_index == len(items):
-            return self.filter_by_type(conn)  # Go back to type selection
-        
-        # Display selected item details
-        selected_item = items[menu_index]
-        print(f"\nItem: {selected_item[1]}")
-        print(f"Type: {selected_type}")
-        print(f"ID: {selected_item[0]}")
-        
-        # Display album artist if available
-        if 'albumartist' in columns and len(selected_item) > 3 and selected_item[3]:
-            print(f"Album Artist: {selected_item[3]}")
-        
-        path_index = 2
-        if 'albumartist' in columns and len(selected_item) > 3:
-            path_index = 2  # Path is still at index 2 for the extended query
-        
-        if selected_item[path_index]:  # If path exists
-            print(f"Path: {selected_item[path_index]}")
+            # Show the menu
+            menu_index = terminal_menu.show()
+            
+            if menu_index is None or menu_index == len(types):
+                return
+            
+            selected_type = types[menu_index]
+            
+            columns = 'item_id, title, path, albumartist' if has_albumartist else 'item_id, title, path'
             
-            # Check if this path exists on the filesystem
-            if os.path.exists(selected_item[path_index]):
-                print("This path exists on the filesystem.")
+            # Page through the items by (title, item_id) rather than OFFSET so
+            # later pages cost the same as the first
+            after = None
+            while True:
+                if after is None:
+                    cursor.execute(f'''
+                        SELECT {columns}
+                        FROM jellyfin_items 
+                        WHERE type = ? 
+                        ORDER BY title, item_id
+                        LIMIT ?
+                    ''', (selected_type, TYPE_PAGE_SIZE))
+                else:
+                    cursor.execute(f'''
+                        SELECT {columns}
+                        FROM jellyfin_items 
+                        WHERE type = ? AND (title, item_id) > (?, ?)
+                        ORDER BY title, item_id
+                        LIMIT ?
+                    ''', (selected_type, after[0], after[1], TYPE_PAGE_SIZE))
                 
-                # Check if the path is already in our folders database
-                cursor.execute('SELECT category_id FROM folders WHERE path = ?', (os.path.dirname(selected_item[path_index]),))
-                folder_category = cursor.fetchone()
+                items = cursor.fetchall()
                 
-                if folder_category:
-                    cursor.execute('SELECT name FROM categories WHERE id = ?', (folder_category[0],))
-                    category_name = cursor.fetchone()[0]
-                    print(f"The folder containing this item is already in the database under category: {category_name}")
-                else:
-                    # Offer to add the folder to the database
-                    add_to_db = input("\nWould you like to add this item's folder to the database? (y/n): ")
-                    if add_to_db.lower() == 'y':
-                        folder_path = os.path.dirname(selected_item[path_index])
-                        
-                        # Get all categories
-                        cursor.execute('SELECT id, name FROM categories ORDER BY name')
-                        categories = cursor.fetchall()
-                        
-                        if not categories:
-                            print("No categories found. Please create categories first.")
-                            input("Press Enter to Continue")
-                            return
-                        
-                        # Create menu of category options
-                        category_menu = []
-                        for id, name in categories:
-                            category_menu.append(f"ID{id} {name}")
-                            
-                        # Display menu and get user choice
-                        category_selector = TerminalMenu(category_menu, title="Select a category for this folder:")
-                        category_index = category_selector.show()
-                        
-                        if category_index is not None:
-                            # Get the selected category
-                            selected_category_id = categories[category_index][0]
-                            selected_category_name = categories[category_index][1]
-                            
-                            # Store in database
-                            try:
-                                # Add username if known
-                                if hasattr(self, 'selected_user_name'):
-                                    cursor.execute(
-                                        'INSERT OR REPLACE INTO folders (path, category_id, user_name) VALUES (?, ?, ?)',
-                                        (folder_path, selected_category_id, self.selected_user_name)
-                                    )
-                                else:
-                                    cursor.execute(
-                                        'INSERT OR REPLACE INTO folders (path, category_id) VALUES (?, ?)',
-                                        (folder_path, selected_category_id)
-                                    )
-                                conn.commit()
-                                print(f"Folder '{folder_path}' added to database under category '{selected_category_name}'.")
-                            except sqlite3.Error as e:
-                                print(f"Database error: {e}")
-        
-        input("\nPress Enter to Continue")
+                if not items:
+                    print(f"No items found of type '{selected_type}'.")
+                    input("Press Enter to Continue")
+                    return
+                
+                print(f"\nShowing {len(items)} items of type '{selected_type}':")
+                
+                # Look up the categories of the listed items' folders up front, and
+                # read their directories in the background for the existence check
+                folders = [os.path.dirname(item['path']) for item in items if item['path']]
+                folder_categories = self.get_folder_categories(cursor, folders)
+                self.prefetch_dir_entries(folders)
+                
+                # Create menu of item titles, each carrying its row index as
+                # preview data; the album artist and path are only formatted
+                # for the highlighted item
+                item_menu = [f"{escape_menu_entry(item['title'])}|{index}" for index, item in enumerate(items)]
+                has_next_page = len(items) == TYPE_PAGE_SIZE
+                if has_next_page:
+                    item_menu.append("Next page")
+                item_menu.append("Back to Type Selection")
+                
+                def preview(key):
+                    # The navigation entries carry no row index
+                    if not key.isdigit():
+                        return ""
+                    return format_item_preview(items[int(key)], has_albumartist)
+                
+                # Show the menu
+                terminal_menu = TerminalMenu(item_menu, title=f"Items of type '{selected_type}':",
+                                             preview_command=preview, preview_size=0.25)
+                menu_index = terminal_menu.show()
+                
+                if has_next_page and menu_index == len(items):
+                    after = (items[-1]['title'], items[-1]['item_id'])
+                    continue
+                break
+            
+            if menu_index is None or menu_index >= len(items):
+                continue  # Go back to type selection
+            
+            # Display selected item details
+            selected_item = items[menu_index]
+            selected_path = selected_item['path']
+            print(f"\nItem: {selected_item['title']}")
+            print(f"Type: {selected_type}")
+            print(f"ID: {selected_item['item_id']}")
+            
+            # Display album artist if available
+            if has_albumartist and selected_item['albumartist']:
+                print(f"Album Artist: {selected_item['albumartist']}")
+            
+            if selected_path:  # If path exists
+                print(f"Path: {selected_path}")
+                
+                self.offer_to_add_item_folder(selected_path, folder_categories)
+            
+            input("\nPress Enter to Continue")
+            return
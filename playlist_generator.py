@@ -88,13 +88,13 @@ def show_main_menu():
             playlist_manager.delete_category()
         elif menu_index == 2:  # Assign albums to categories
             # Get selected user name from Jellyfin manager if available
-            current_username = getattr(jellyfin_manager, 'selected_user_name', None)
+            current_username = jellyfin_manager.selected_user_name
             playlist_manager.assign_albums(current_username)
         elif menu_index == 3:  # Reassign albums
             playlist_manager.reassign_albums()
         elif menu_index == 4:  # Import CSV
             # Get selected user name from Jellyfin manager if available
-            current_username = getattr(jellyfin_manager, 'selected_user_name', None)
+            current_username = jellyfin_manager.selected_user_name
             playlist_manager.import_csv(current_username)
         elif menu_index == 5:  # Generate playlists
             playlist_manager.write_playlists()
@@ -6,12 +6,43 @@ import json
 import sqlite3
 import subprocess
 import configparser
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from os import scandir
-from os.path import isfile, join, splitext
-import xml.etree.cElementTree as ET
+from os.path import isfile, join
+import xml.etree.ElementTree as ET
 from simple_term_menu import TerminalMenu
 
+# File extensions treated as audio, in lower case
+AUDIO_EXTENSIONS = frozenset({".mp3", ".ogg", ".flac", ".m4a", ".wma", ".ape"})
+
+
+def is_audio_file(name):
+    """Return whether a file name ends in one of the audio extensions."""
+    dot = name.rfind('.')
+    return dot > 0 and name[dot:].lower() in AUDIO_EXTENSIONS
+
+
+def open_database(db_file, **connect_args):
+    """Open the playlist database with the settings shared by every connection to it."""
+    conn = sqlite3.connect(db_file, **connect_args)
+    # WAL lets commits append to a log instead of rewriting pages, and
+    # NORMAL sync only fsyncs at checkpoints rather than every commit
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    # 64 MiB page cache (negative values are in KiB)
+    conn.execute('PRAGMA cache_size=-65536')
+    # Read pages through a 256 MiB memory map instead of copying them
+    conn.execute('PRAGMA mmap_size=268435456')
+    return conn
+
+
+def truncate(text, width):
+    """Cut text to width characters, ending in "..." when it was too long."""
+    return text if len(text) <= width else text[:width - 3] + "..."
+
+
 class PlaylistManager:
     """Class to manage playlist operations and database interactions."""
     
@@ -20,7 +51,8 @@ class PlaylistManager:
         self.db_file = db_file
         self.music_location = music_location
         self.ffprobe_path = ffprobe_path
-        self.allowed_extensions = [".mp3",".ogg",".flac",".m4a",".wma",".ape"]
+        # Database connection, opened on first use and kept for reuse
+        self.conn = None
         
         # Initialize the database
         self.init_database()
@@ -28,9 +60,15 @@ class PlaylistManager:
         # Get categories from database
         self.categories = self.get_categories_dict()
     
+    def get_connection(self):
+        """Return the shared database connection, opening it on first use."""
+        if self.conn is None:
+            self.conn = open_database(self.db_file)
+        return self.conn
+    
     def init_database(self):
         """Initialize SQLite database with necessary tables if they don't exist."""
-        conn = sqlite3.connect(self.db_file)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         # Create categories table
@@ -65,19 +103,64 @@ class PlaylistManager:
         )
         ''')
         
+        # Genre tags read by ffprobe, kept with the modification time and
+        # size of the file so they are only read again when it changes
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS probe_cache (
+            path TEXT PRIMARY KEY,
+            mtime REAL NOT NULL,
+            size INTEGER NOT NULL,
+            genre TEXT
+        )
+        ''')
+        
+        # Index the columns Jellyfin items are browsed by; folders.path needs
+        # no index of its own as its UNIQUE constraint already provides one
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_jellyfin_items_parent_type
+        ON jellyfin_items (parent_id, type)
+        ''')
+        
+        # Lets folder listings read children already sorted by title
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_jellyfin_items_parent_title
+        ON jellyfin_items (parent_id, title)
+        ''')
+        
+        # Lets items of one type be paged through in title order
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_jellyfin_items_type_title
+        ON jellyfin_items (type, title, item_id)
+        ''')
+        
+        # Case-insensitive title index, which returns search results in
+        # order so the scan can stop at the LIMIT
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_jellyfin_items_title
+        ON jellyfin_items (title COLLATE NOCASE)
+        ''')
+        
+        # Folders are counted and detached by category when one is deleted
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_folders_category
+        ON folders (category_id)
+        ''')
+        
         conn.commit()
-        conn.close()
+        
+        # Gathers statistics for any index that has none yet, such as one
+        # just created, and is cheap when there is nothing to do
+        cursor.execute('PRAGMA optimize')
         return True
     
     def get_categories_dict(self):
         """Get categories from database as a dictionary of name: id."""
         categories = {}
-        conn = sqlite3.connect(self.db_file)
+        conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute('SELECT id, name FROM categories')
         for row in cursor.fetchall():
             categories[row[1]] = row[0]
-        conn.close()
         return categories
     
     def create_category(self):
@@ -94,18 +177,14 @@ class PlaylistManager:
             print("Category name cannot be empty.")
             return False
         
-        conn = sqlite3.connect(self.db_file)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         try:
-            # Get the highest existing ID
-            cursor.execute('SELECT MAX(id) FROM categories')
-            result = cursor.fetchone()
-            new_id = 0 if result[0] is None else result[0] + 1
-            
-            # Insert the new category
-            cursor.execute('INSERT INTO categories (id, name) VALUES (?, ?)', (new_id, category_name))
-            conn.commit()
+            # Insert the new category, letting SQLite assign the next id
+            with conn:
+                cursor.execute('INSERT INTO categories (name) VALUES (?)', (category_name,))
+            new_id = cursor.lastrowid
             print(f"Category '{category_name}' created successfully.")
             
             # Update local categories dictionary
@@ -118,12 +197,10 @@ class PlaylistManager:
         except sqlite3.Error as e:
             print(f"Database error: {e}")
             return False
-        finally:
-            conn.close()
     
     def delete_category(self):
         """Delete a category from the database."""
-        conn = sqlite3.connect(self.db_file)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         # Get all categories
@@ -132,7 +209,6 @@ class PlaylistManager:
         
         if not categories:
             print("No categories found.")
-            conn.close()
             return False
         
         # Create menu of category options
@@ -147,13 +223,11 @@ class PlaylistManager:
         
         if menu_index is None:
             print("No category selected.")
-            conn.close()
             return False
         
         # Check if "Back to Main Menu" was selected
         if menu_index == len(categories):
             print("Returning to main menu.")
-            conn.close()
             return False
         
         # Get the selected category
@@ -168,7 +242,6 @@ class PlaylistManager:
             confirm = input(f"Warning: {folder_count} folders are assigned to '{selected_category_name}'. Delete anyway? (y/n): ")
             if confirm.lower() != 'y':
                 print("Deletion cancelled.")
-                conn.close()
                 return False
         
         try:
@@ -187,11 +260,22 @@ class PlaylistManager:
                 
             return True
         except sqlite3.Error as e:
+            conn.rollback()
             print(f"Database error: {e}")
             return False
-        finally:
-            conn.close()
     
+    def valid_csv_rows(self, csv_reader, category_ids):
+        """Yield (path, category_id) for each CSV row whose category exists."""
+        for row in csv_reader:
+            if len(row) < 2:
+                print("Warning: Skipping invalid row (needs at least 2 columns)")
+                continue
+            category_id = int(row[1])
+            if category_id not in category_ids:
+                print(f"Warning: Category ID {category_id} does not exist. Skipping entry.")
+                continue
+            yield row[0], category_id
+
     def import_csv(self, username=None):
         """Import playlist categories from a CSV file."""
         print("---------Import playlist categories from CSV file---------")
@@ -219,7 +303,7 @@ class PlaylistManager:
             if not username.strip():
                 username = None
         
-        conn = sqlite3.connect(self.db_file)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         # Check if user_name column exists in the folders table
@@ -235,37 +319,25 @@ class PlaylistManager:
             except sqlite3.Error as e:
                 print(f"Error adding user_name column: {e}")
         
-        imported_count = 0
         try:
+            # Check the category IDs against one read of the categories table
+            cursor.execute('SELECT id FROM categories')
+            category_ids = {category_id for category_id, in cursor.fetchall()}
+            
             with open(file_path, newline='') as csvfile:
                 csv_reader = csv.reader(csvfile, delimiter=',', quotechar='|', quoting=csv.QUOTE_MINIMAL)
-                for row in csv_reader:
-                    if len(row) >= 2:
-                        folder_path = row[0]
-                        category_id = int(row[1])
-                        
-                        # Check if the category exists
-                        cursor.execute('SELECT id FROM categories WHERE id = ?', (category_id,))
-                        if cursor.fetchone() is None:
-                            print(f"Warning: Category ID {category_id} does not exist. Skipping entry.")
-                            continue
-                        
-                        # Insert or update the folder-category mapping with username if available
-                        if 'user_name' in columns and username is not None:
-                            cursor.execute(
-                                'INSERT OR REPLACE INTO folders (path, category_id, user_name) VALUES (?, ?, ?)',
-                                (folder_path, category_id, username)
-                            )
-                        else:
-                            cursor.execute(
-                                'INSERT OR REPLACE INTO folders (path, category_id) VALUES (?, ?)',
-                                (folder_path, category_id)
-                            )
-                        imported_count += 1
-                    else:
-                        print("Warning: Skipping invalid row (needs at least 2 columns)")
+                rows = self.valid_csv_rows(csv_reader, category_ids)
+                if 'user_name' in columns and username is not None:
+                    rows = ((folder_path, category_id, username) for folder_path, category_id in rows)
+                    insert_sql = 'INSERT OR REPLACE INTO folders (path, category_id, user_name) VALUES (?, ?, ?)'
+                else:
+                    insert_sql = 'INSERT OR REPLACE INTO folders (path, category_id) VALUES (?, ?)'
+                
+                # Stream the folder-category mappings into one transaction
+                with conn:
+                    cursor.executemany(insert_sql, rows)
+                imported_count = cursor.rowcount
             
-            conn.commit()
             print(f"Successfully imported {imported_count} entries from CSV.")
             if username is not None:
                 print(f"All entries associated with user: '{username}'")
@@ -273,12 +345,10 @@ class PlaylistManager:
         except Exception as e:
             print(f"Error importing CSV: {e}")
             return False
-        finally:
-            conn.close()
     
     def reassign_albums(self):
         """Reassign folder paths to categories."""
-        conn = sqlite3.connect(self.db_file)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         # Get all categories
@@ -287,7 +357,6 @@ class PlaylistManager:
         
         if not categories:
             print("No categories found. Please create categories first.")
-            conn.close()
             return False
         
         # Get all music folders
@@ -295,37 +364,19 @@ class PlaylistManager:
         
         if not music_folders:
             print(f"No music folders found in {self.music_location}")
-            conn.close()
             return False
         
         # Load existing folder-category mappings
         folders_with_categories = self.get_folders_with_categories()
         
-        # Create folder menu with truncated format
-        folder_menu = []
-        
+        # Create folder menu with the path padded to exactly 60 chars and the
+        # category truncated to 30 chars
         PATH_WIDTH = 60  # Exact width for path column
-        
-        for folder in music_folders:
-            relative_path = folder.replace(self.music_location, '')
-            # Truncate or pad path to exactly 60 chars
-            if len(relative_path) > PATH_WIDTH:
-                display_path = relative_path[:PATH_WIDTH-3] + "..."
-            else:
-                # Space padding to exactly 60 chars
-                display_path = relative_path + " " * (PATH_WIDTH - len(relative_path))
-                
-            if folder in folders_with_categories:
-                category_name = folders_with_categories[folder]['category_name']
-                # Truncate category to 30 chars max
-                if len(category_name) > 30:
-                    display_category = category_name[:27] + "..."
-                else:
-                    display_category = category_name
-                folder_menu.append(f"{display_path} {display_category}")
-            else:
-                # ANSI red for uncategorized
-                folder_menu.append(f"{display_path} Uncategorized")
+        folder_menu = [
+            f"{truncate(self.relative_path(folder), PATH_WIDTH):<{PATH_WIDTH}} "
+            + (truncate(folders_with_categories[folder]['category_name'], 30) if folder in folders_with_categories else "Uncategorized")
+            for folder in music_folders
+        ]
         
         # Add a "Back to Main Menu" option
         folder_menu.append("------ Back to Main Menu ------")
@@ -344,21 +395,19 @@ class PlaylistManager:
             
             if menu_index is None:
                 print("No folder selected.")
-                conn.close()
                 return False
             
             # Check if "Back to Main Menu" option was selected
             if menu_index == len(music_folders):
                 print("Returning to main menu.")
-                conn.close()
                 return False
             
             current_index = menu_index  # Save the current position
             selected_folder = music_folders[menu_index]
-            relative_path = selected_folder.replace(self.music_location, '')
+            relative_path = self.relative_path(selected_folder)
             
             # Show the audio files to help user categorize
-            audio_files = [f.name for f in scandir(selected_folder) if f.is_file() and splitext(f.name)[1].lower() in self.allowed_extensions]
+            audio_files = [f.name for f in scandir(selected_folder) if f.is_file() and is_audio_file(f.name)]
             print(f"\nFolder: \033[91m{relative_path}\033[00m")
             print(f"Contains {len(audio_files)} audio files:")
             for i, file in enumerate(sorted(audio_files[:5])):  # Show first 5 files
@@ -417,37 +466,22 @@ class PlaylistManager:
                 print(f"Folder '{relative_path}' assigned to category '{selected_category_name}'.")
                 
                 # Update the folder menu display for the current item
-                # Truncate or pad path to exactly 60 chars
-                if len(relative_path) > PATH_WIDTH:
-                    display_path = relative_path[:PATH_WIDTH-3] + "..."
-                else:
-                    # Space padding to exactly 60 chars
-                    display_path = relative_path + " " * (PATH_WIDTH - len(relative_path))
-                    
-                if len(selected_category_name) > 30:
-                    display_category = selected_category_name[:27] + "..."
-                else:
-                    display_category = selected_category_name
-                    
-                folder_menu[menu_index] = f"{display_path} {display_category}"
+                folder_menu[menu_index] = f"{truncate(relative_path, PATH_WIDTH):<{PATH_WIDTH}} {truncate(selected_category_name, 30)}"
                 
                 # Reload folder-category mappings
                 folders_with_categories = self.get_folders_with_categories()
             except sqlite3.Error as e:
+                conn.rollback()
                 print(f"Database error: {e}")
-                conn.close()
                 return False
-        
-        # Should never reach here as the loop continues until user exits
-        conn.close()
     
     def ffprobe(self, file_path):
-        """Run ffprobe on a file and return JSON output with media information."""
+        """Run ffprobe on a file and return JSON output with its format tags."""
+        # Only the tags are used, so skip the stream and format details
         command_array = [self.ffprobe_path,
                          "-v", "quiet",
                          "-print_format", "json",
-                         "-show_format",
-                         "-show_streams",
+                         "-show_entries", "format_tags",
                          file_path]
         result = subprocess.run(command_array, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
         if result.returncode==0:
@@ -455,22 +489,19 @@ class PlaylistManager:
         else:
           return "{}"
     
-    def scantree(self, path):
-        """Recursively yield DirEntry objects for given directory."""
-        for entry in scandir(path):
-            if entry.is_dir(follow_symlinks=False):
-                yield from self.scantree(entry.path)
-            else:
-                yield entry
-    
+    def relative_path(self, folder):
+        """Return a folder path relative to the music location."""
+        if folder.startswith(self.music_location):
+            return folder[len(self.music_location):]
+        return folder
+
     def getpaths(self, path):
         """Get all directory paths containing music files."""
+        # os.walk visits each directory once, so no duplicate check is needed
         paths = []
-        for entry in self.scantree(path):
-                file_name, file_extension = splitext(entry.path)
-                if file_extension.lower() in self.allowed_extensions:
-                        if os.path.dirname(entry.path) not in paths:
-                                paths.append(os.path.dirname(entry.path))
+        for root, dirs, files in os.walk(path):
+                if any(is_audio_file(file) for file in files):
+                        paths.append(root)
         return paths
     
     def getdictpaths(self, oldpath, paths):
@@ -481,27 +512,25 @@ class PlaylistManager:
                 files[newpath] = []
                 for file in scandir(path):
                         if file.is_file(follow_symlinks=False):
-                                file_name, file_extension = splitext(file.path)
-                                if file_extension.lower() in self.allowed_extensions:
+                                if is_audio_file(file.name):
                                         files[newpath].append(file.name)
         return files
     
     def get_category_name(self, category_id):
         """Get category name from database by id."""
-        conn = sqlite3.connect(self.db_file)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute('SELECT name FROM categories WHERE id = ?', (category_id,))
         result = cursor.fetchone()
         
-        conn.close()
         if result:
             return result[0]
         return None
     
     def store_folder_category(self, folder_path, category_id, user_name=None):
         """Store folder path with associated category in database."""
-        conn = sqlite3.connect(self.db_file)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         # Check if user_name column exists in the folders table
@@ -522,48 +551,35 @@ class PlaylistManager:
             conn.commit()
             result = True
         except sqlite3.Error as e:
+            conn.rollback()
             print(f"Database error: {e}")
             result = False
-        finally:
-            conn.close()
         
         return result
     
     def get_folders_with_categories(self):
         """Get all folders with their assigned categories from database."""
-        conn = sqlite3.connect(self.db_file)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         # First check if user_name column exists
         cursor.execute("PRAGMA table_info(folders)")
         columns = [column[1] for column in cursor.fetchall()]
         
-        if 'user_name' in columns:
-            cursor.execute('''
-                SELECT f.path, f.category_id, c.name, f.user_name
-                FROM folders f
-                JOIN categories c ON f.category_id = c.id
-            ''')
-        else:
-            # If user_name column doesn't exist, don't include it
-            cursor.execute('''
-                SELECT f.path, f.category_id, c.name
-                FROM folders f
-                JOIN categories c ON f.category_id = c.id
-            ''')
-        
-        result = cursor.fetchall()
-        conn.close()
-        
-        # Convert to dictionary for easier use
-        folders_dict = {}
-        for row in result:
-            if 'user_name' in columns and len(row) > 3:
-                folders_dict[row[0]] = {"category_id": row[1], "category_name": row[2], "user_name": row[3]}
-            else:
-                folders_dict[row[0]] = {"category_id": row[1], "category_name": row[2], "user_name": None}
+        # Older databases have no user_name column, so select NULL in its place
+        user_name_column = 'f.user_name' if 'user_name' in columns else 'NULL'
+        cursor.row_factory = sqlite3.Row
+        cursor.execute(f'''
+            SELECT f.path, f.category_id, c.name AS category_name, {user_name_column} AS user_name
+            FROM folders f
+            JOIN categories c ON f.category_id = c.id
+        ''')
         
-        return folders_dict
+        # Build the dictionary straight from the cursor
+        return {
+            row['path']: {"category_id": row['category_id'], "category_name": row['category_name'], "user_name": row['user_name']}
+            for row in cursor
+        }
     
     def assign_albums(self, username=None):
         """Assign folder paths to categories."""
@@ -585,7 +601,7 @@ class PlaylistManager:
                 # If user pressed Enter without typing anything, set to None
                 username = username_input.strip() if username_input.strip() else None
 
-        conn = sqlite3.connect(self.db_file)
+        conn = self.get_connection()
         cursor = conn.cursor()
 
         # Get all categories
@@ -594,7 +610,6 @@ class PlaylistManager:
         
         if not categories:
             print("No categories found. Please create categories first.")
-            conn.close()
             return False
 
         # For new folders not in database yet, prompt user to choose category
@@ -609,11 +624,11 @@ class PlaylistManager:
             albumsProcessed = True
                 
             # For remaining uncategorized folders, prompt user to select category
-            relative_path = folder.replace(self.music_location, '')
+            relative_path = self.relative_path(folder)
             print(f"\nCategorizing folder: \033[91m{relative_path}\033[00m")
             
             # Show the audio files to help user categorize
-            audio_files = [f.name for f in scandir(folder) if f.is_file() and splitext(f.name)[1].lower() in self.allowed_extensions]
+            audio_files = [f.name for f in scandir(folder) if f.is_file() and is_audio_file(f.name)]
             print(f"Contains {len(audio_files)} audio files:")
             for i, file in enumerate(sorted(audio_files[:5])):  # Show first 5 files
                 print(f"  {i+1}. {file}")
@@ -648,14 +663,12 @@ class PlaylistManager:
                 print("Skip selected, skipping folder")
             elif menu_index == len(categories) + 1 or menu_index is None:
                 print("Back to Main Menu selected, returning to main menu")
-                conn.close()
                 return
         
         if albumsProcessed is None:
             print("No remaining albums to process")
         
         input("Press Enter to Continue")
-        conn.close()
     
     def write_playlists(self):
         """Generate XML playlists from categorized folders."""
@@ -664,27 +677,52 @@ class PlaylistManager:
 
         # Build playlists database
         newplaylist = {}
+        # (category name, file path, mtime, size) of every playlist file
+        probe_files = []
 
         # Process folders from the database
         for folder_path, folder_info in folders_with_categories.items():
             category_name = folder_info['category_name']
             
             # Process the folder's audio files
-            newfiles = [newfile.name for newfile in scandir(folder_path) if splitext(newfile)[1].lower() in self.allowed_extensions]
+            newfiles = [newfile for newfile in scandir(folder_path) if newfile.is_file() and is_audio_file(newfile.name)]
             
             print(f"Processing folder from database: {folder_path} -> {category_name}")
             
             if category_name not in newplaylist:
-                newplaylist[category_name] = {}
-            if 'genres' not in newplaylist[category_name]:
-                newplaylist[category_name]['genres'] = []
-            if 'files' not in newplaylist[category_name]:
-                newplaylist[category_name]['files'] = []
-            
-            for file in sorted(newfiles):
-                newplaylist[category_name]['files'].append(os.path.join(folder_path, file))
+                # Genres are kept as a set and sorted when the XML is written
+                newplaylist[category_name] = {'genres': set(), 'files': []}
+            
+            for newfile in sorted(newfiles, key=lambda newfile: newfile.name):
+                file_path = os.path.join(folder_path, newfile.name)
+                newplaylist[category_name]['files'].append(file_path)
+                file_stat = newfile.stat()
+                probe_files.append((category_name, file_path, file_stat.st_mtime, file_stat.st_size))
+        
+        # Reuse the genres probed on earlier runs for files that have not
+        # changed since, going by their modification time and size
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT path, mtime, size, genre FROM probe_cache')
+        cached = {path: (mtime, size, genre) for path, mtime, size, genre in cursor.fetchall()}
+        file_genres = {}
+        to_probe = []
+        for _, file_path, mtime, size in probe_files:
+            cached_probe = cached.get(file_path)
+            if cached_probe is not None and cached_probe[:2] == (mtime, size):
+                file_genres[file_path] = cached_probe[2]
+            else:
+                to_probe.append((file_path, mtime, size))
+        
+        # ffprobe does its work in a separate process, so threads are enough
+        # to keep several probes running at once
+        new_probes = []
+        with ThreadPoolExecutor(max_workers=(os.cpu_count() or 1) * 2) as executor:
+            probe_outputs = executor.map(self.ffprobe, [file_path for file_path, _, _ in to_probe])
+            for (file_path, mtime, size), output in zip(to_probe, probe_outputs):
                 genre = None 
-                tags = json.loads(self.ffprobe(os.path.join(folder_path, file)))['format']['tags']
+                probe = json.loads(output)
+                tags = probe.get('format', {}).get('tags', {})
                 try:
                     genre = tags['GENRE']
                 except KeyError:
@@ -692,9 +730,21 @@ class PlaylistManager:
                         genre = tags['genre']
                     except KeyError:
                         pass
-                if genre is not None:
-                    genres = genre.split(";") 
-                    newplaylist[category_name]['genres'].extend(genre for genre in genres if genre not in newplaylist[category_name]['genres'])
+                file_genres[file_path] = genre
+                # Failed probes return an empty object and are retried next time
+                if 'format' in probe:
+                    new_probes.append((file_path, mtime, size, genre))
+        
+        with conn:
+            cursor.executemany(
+                'INSERT OR REPLACE INTO probe_cache (path, mtime, size, genre) VALUES (?, ?, ?, ?)',
+                new_probes
+            )
+        
+        for category_name, file_path, _, _ in probe_files:
+            genre = file_genres[file_path]
+            if genre is not None:
+                newplaylist[category_name]['genres'].update(genre.split(";"))
 
         print(f"Generated {len(newplaylist)} playlists")
         
@@ -716,7 +766,6 @@ class PlaylistManager:
             
             # Define XML file path
             NewXML = os.path.join(category_dir, "playlist.xml")
-            out = open(NewXML, 'wb')
             playlistxml = ET.Element('Item')
             ET.SubElement(playlistxml, 'Added').text = datetime.now().strftime('%m/%d/%Y %H:%M:%S')
             ET.SubElement(playlistxml, 'LockData').text = 'false'
@@ -731,11 +780,10 @@ class PlaylistManager:
                 playlistitem = ET.SubElement(playlistitems, 'PlaylistItem')
                 ET.SubElement(playlistitem, 'Path').text = f"{file}"
             ET.SubElement(playlistxml, 'PlaylistMediaType').text = 'Audio'
-            tree = ET.ElementTree(playlistxml)
-            ET.indent(tree, space="\t", level=0)
-            out.write(b'<?xml version="1.0" encoding="utf-8" standalone="yes"?>\n')
-            tree.write(out, encoding='UTF-8', xml_declaration=False)
-            out.close()
+            ET.indent(playlistxml, space="\t", level=0)
+            # Serialize in memory and write the file in one go
+            with open(NewXML, 'wb') as out:
+                out.write(b'<?xml version="1.0" encoding="utf-8" standalone="yes"?>\n' + ET.tostring(playlistxml, encoding='UTF-8', xml_declaration=False))
             
             print(f"Written playlist XML: {NewXML} with {len(newplaylist[playlist]['files'])} files")
         
@@ -743,7 +791,7 @@ class PlaylistManager:
     
     def prune_invalid_paths(self):
         """Prune invalid paths from the database."""
-        conn = sqlite3.connect(self.db_file)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         # Get all folder paths from the database
@@ -752,7 +800,6 @@ class PlaylistManager:
         
         if not folders:
             print("No folders found in database.")
-            conn.close()
             return False
         
         invalid_count = 0
@@ -760,8 +807,27 @@ class PlaylistManager:
         
         print("\nChecking for invalid paths in database...")
         
+        # List each parent directory once instead of checking every folder
+        # on its own, since folders usually share parents. Parents that
+        # cannot be listed are left as None and their folders checked one
+        # by one.
+        parent_entries = {}
+        for _, folder_path, _ in folders:
+            parent = os.path.dirname(os.path.normpath(folder_path))
+            if parent not in parent_entries:
+                try:
+                    with scandir(parent) as entries:
+                        parent_entries[parent] = {entry.name for entry in entries}
+                except OSError:
+                    parent_entries[parent] = None
+        
         for folder_id, folder_path, category_id in folders:
-            if not os.path.exists(folder_path):
+            parent, name = os.path.split(os.path.normpath(folder_path))
+            entries = parent_entries[parent]
+            # Confirm misses with os.path.exists so a stale or case-sensitive
+            # listing never marks an existing folder invalid
+            exists = (bool(name) and entries is not None and name in entries) or os.path.exists(folder_path)
+            if not exists:
                 invalid_count += 1
                 category_name = self.get_category_name(category_id) or "Unknown"
                 print(f"Invalid path found: '{folder_path}' (Category: {category_name})")
@@ -783,11 +849,11 @@ class PlaylistManager:
                     print(f"Skipping this entry.")
                 elif menu_index == 3 or menu_index is None:  # Cancel
                     print(f"Cancelling prune operation.")
-                    conn.close()
+                    # Nothing removed so far is kept
+                    conn.rollback()
                     return False
         
         conn.commit()
-        conn.close()
         
         print(f"\nSummary: Found {invalid_count} invalid paths, removed {removed_count} entries.")
         input("Press Enter to Continue")
@@ -797,7 +863,7 @@ class PlaylistManager:
         """Update all folders in the database to have the specified user_name."""
         print(f"\n---------Updating Folders User to '{username}'---------")
         
-        conn = sqlite3.connect(self.db_file)
+        conn = self.get_connection()
         cursor = conn.cursor()
         
         try:
@@ -826,10 +892,9 @@ class PlaylistManager:
             
             result = True
         except sqlite3.Error as e:
+            conn.rollback()
             print(f"Database error: {e}")
             result = False
-        finally:
-            conn.close()
         
         input("\nPress Enter to Continue")
         return result
\ No newline at end of file